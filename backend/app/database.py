@@ -1,13 +1,38 @@
 import os
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy import create_engine, inspect, Column, Integer, String, Float, Date, DateTime, ForeignKey
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from datetime import datetime
 
-DATABASE_URL = "postgresql://admin:securepassword@db/veggie_db"
+DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://admin:securepassword@db/veggie_db")
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", DATABASE_URL
+    .replace("postgresql://", "postgresql+asyncpg://", 1).replace("sqlite://", "sqlite+aiosqlite://", 1))
+USE_ASYNC_DB = os.getenv("USE_ASYNC_DB", "1") == "1"
+WARM_CONNECTIONS = int(os.getenv("DB_WARM_CONNECTIONS", "2")) # per engine, opened at startup
 
-engine = create_engine(DATABASE_URL)
+def pool_settings(url):
+    if url.startswith("sqlite"): return {}
+    return {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": True,
+    }
+
+engine = create_engine(DATABASE_URL, **pool_settings(DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Async engine for the hot endpoints; the Raspberry Pi build has no asyncpg and stays sync
+try:
+    if not USE_ASYNC_DB: raise ImportError("disabled by USE_ASYNC_DB")
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, **pool_settings(ASYNC_DATABASE_URL))
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+except ImportError as e:
+    async_engine = None
+    AsyncSessionLocal = None
+    print(f"⚠️ Async DB off, using sync sessions only ({e})")
 Base = declarative_base()
 
 class User(Base):
@@ -26,15 +51,16 @@ class Product(Base):
 class Transaction(Base):
     __tablename__ = "transactions"
     id = Column(Integer, primary_key=True, index=True)
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(DateTime, default=datetime.utcnow, index=True)
     total_amount = Column(Float)
     cashier_name = Column(String)
+    idempotency_key = Column(String) # Unique index: migration 2
     items = relationship("TransactionItem", back_populates="transaction")
 
 class TransactionItem(Base):
     __tablename__ = "transaction_items"
     id = Column(Integer, primary_key=True, index=True)
-    transaction_id = Column(Integer, ForeignKey("transactions.id"))
+    transaction_id = Column(Integer, ForeignKey("transactions.id"), index=True)
     product_name = Column(String)
     weight = Column(Float)
     price_per_unit = Column(Float)
@@ -42,11 +68,49 @@ class TransactionItem(Base):
     total_price = Column(Float)
     transaction = relationship("Transaction", back_populates="items")
 
+# Pre-aggregated sales, kept current by checkout (see services/sales_rollup.py)
+class SalesRollup(Base):
+    __tablename__ = "sales_rollup"
+    store_id = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True)
+    hour = Column(Integer, primary_key=True)
+    cashier_name = Column(String, primary_key=True)
+    product_name = Column(String, primary_key=True) # "" = whole-transaction totals
+    txn_count = Column(Integer, nullable=False, default=0)
+    sales = Column(Float, nullable=False, default=0)
+    kg = Column(Float, nullable=False, default=0)
+    items = Column(Integer, nullable=False, default=0)
+
+# Append-only: a price change closes the open row and opens a new one (see services/price_history.py)
+class ProductPriceHistory(Base):
+    __tablename__ = "product_price_history"
+    id = Column(Integer, primary_key=True, index=True)
+    product_name = Column(String, nullable=False)
+    price = Column(Float, nullable=False)
+    valid_from = Column(DateTime, nullable=False) # [valid_from, valid_to), UTC like Transaction.timestamp
+    valid_to = Column(DateTime) # NULL = current price; indexes: migration 3
+
+# Discounts applied by the pricing engine (see services/pricing.py); the best one for a line wins, they don't stack
+class Promotion(Base):
+    __tablename__ = "promotions"
+    id = Column(Integer, primary_key=True, index=True)
+    product_name = Column(String, index=True) # NULL = every product
+    percent_off = Column(Float, nullable=False)
+    start_hour = Column(Integer) # Store-local time-of-day window [start, end), may wrap midnight; NULL = all day
+    end_hour = Column(Integer)
+    min_weight = Column(Float) # kg on the line (weight x qty) needed to qualify; NULL = any
+    valid_from = Column(Date) # NULL = open-ended
+    valid_to = Column(Date)
+
 def init_db():
-    Base.metadata.create_all(bind=engine)
+    # One table listing instead of create_all's existence check per table; a restart creates nothing
+    existing = set(inspect(engine).get_table_names())
+    missing = [t for t in Base.metadata.sorted_tables if t.name not in existing]
+    if missing:
+        Base.metadata.create_all(bind=engine, tables=missing)
     # Seed Initial Products if empty
     db = SessionLocal()
-    if db.query(Product).count() == 0:
+    if db.query(Product.id).first() is None:
         initial_prices = {
             "Carrot": 25.0, "Tomato": 40.0, "Pumpkin": 30.0, "Corn": 20.0,
             "Red_Chili": 80.0, "Bell_Pepper": 90.0, "Cucumber": 25.0, "Unknown": 0.0
@@ -57,7 +121,21 @@ def init_db():
         print("✅ Initial Prices Seeded")
     db.close()
 
+def warm_pool():
+    # Connect now, so the first requests after a restart find pooled connections
+    conns = [engine.connect() for _ in range(WARM_CONNECTIONS)]
+    for conn in conns: conn.close()
+
+async def warm_async_pool():
+    if async_engine is None: return
+    conns = [await async_engine.connect() for _ in range(WARM_CONNECTIONS)]
+    for conn in conns: await conn.close()
+
 def get_db():
     db = SessionLocal()
     try: yield db
-    finally: db.close()
\ No newline at end of file
+    finally: db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
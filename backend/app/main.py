@@ -1,24 +1,68 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from .database import init_db
-from .routers import auth, pos, dashboard, products
+from .database import init_db, warm_pool, warm_async_pool
+from .migrations import migrate
+from .routers import auth, pos, dashboard, products, stream, admin
+from .services import price_catalog, ai_service, checkout_journal, hardware, metrics, profiler, startup
+from .services.password_pool import pool as password_pool
 
-app = FastAPI(title="Veggie POS V3")
+def _database():
+    init_db()
+    migrate() # Includes the one-off sales rollup backfill
+
+# Nothing connects at import: the lifespan starts these concurrently, each after its `after`
+startup.add("database", _database)
+startup.add("catalog", price_catalog.start, after=("database",))
+startup.add("journal", lambda: checkout_journal.start(pos.sync_journal)) # Its syncer retries the DB on its own
+startup.add("model", ai_service.load)
+startup.add("scale", hardware.start)
+startup.add("db_pool", warm_pool, after=("database",), required=False)
+startup.add("db_async_pool", warm_async_pool, after=("database",), required=False)
+startup.add("password_pool", password_pool.warm, required=False)
+
+@asynccontextmanager
+async def lifespan(app):
+    startup.begin() # In the background: the port opens now, /ready tells when the app can serve
+    yield
+    startup.stop()
+    password_pool.shutdown()
+
+app = FastAPI(title="Veggie POS V3", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
+app.add_middleware(profiler.ProfilerMiddleware)
+app.add_middleware(metrics.MetricsMiddleware) # Outermost: times CORS and error handling too
 
-init_db()
-
-app.include_router(auth.router, prefix="/auth", tags=["Auth"])
-app.include_router(pos.router, prefix="/api", tags=["POS"])
-app.include_router(dashboard.router, prefix="/api", tags=["Dashboard"])
-app.include_router(products.router, prefix="/api", tags=["Products"]) # New Router
+# Each router (POS: each route) waits only for what it uses, so e.g. checkout serves while the scale reader is still coming up
+db_ready = Depends(startup.requires("database"))
+authenticated = Depends(auth.get_current_user)
+app.include_router(auth.router, prefix="/auth", tags=["Auth"], dependencies=[db_ready])
+app.include_router(pos.router, prefix="/api", tags=["POS"], dependencies=[authenticated])
+app.include_router(dashboard.router, prefix="/api", tags=["Dashboard"], dependencies=[db_ready, authenticated])
+app.include_router(products.router, prefix="/api", tags=["Products"], # New Router
+                   dependencies=[Depends(startup.requires("database", "catalog")), authenticated])
+app.include_router(stream.router, tags=["Stream"], dependencies=[Depends(startup.requires("scale"))])
+app.include_router(admin.router, prefix="/api", tags=["Admin"], dependencies=[db_ready, Depends(auth.require_admin)])
 
 @app.get("/")
 def root():
-    return {"status": "System Online", "version": "3.0.0"}
\ No newline at end of file
+    return {"status": "System Online", "version": "3.0.0"}
+
+@app.get("/ready")
+def readiness():
+    # 503 until every required subsystem is up, with each one's state; "/" stays the liveness check
+    report = startup.report()
+    return JSONResponse(report, status_code=200 if report["ready"] else 503)
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    # Unauthenticated like "/": for the Prometheus scraper on the store network
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,82 @@
+# Lightweight schema migrations: numbered steps, applied once each and recorded in schema_migrations.
+# create_all() only creates missing tables, so anything added to an existing table goes here.
+import time
+from datetime import datetime
+from sqlalchemy import inspect, text
+from .database import engine
+from .services import sales_rollup
+
+def _drop_invalid(conn, dialect, name):
+    # A CREATE INDEX CONCURRENTLY that was interrupted leaves an INVALID index that IF NOT EXISTS would skip forever
+    if dialect != "postgresql": return
+    invalid = conn.execute(text("SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                                "WHERE c.relname = :name AND NOT i.indisvalid"), {"name": name}).first()
+    if invalid:
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+
+def _transaction_indexes(conn, dialect):
+    # CONCURRENTLY keeps checkout writing while Postgres builds the index on a live table
+    concurrently = "CONCURRENTLY " if dialect == "postgresql" else ""
+    for name in ("ix_transactions_timestamp", "ix_transaction_items_transaction_id", "brin_transactions_timestamp"):
+        _drop_invalid(conn, dialect, name)
+    conn.execute(text(f"CREATE INDEX {concurrently}IF NOT EXISTS ix_transactions_timestamp ON transactions (timestamp)"))
+    conn.execute(text(f"CREATE INDEX {concurrently}IF NOT EXISTS ix_transaction_items_transaction_id ON transaction_items (transaction_id)"))
+    if dialect == "postgresql":
+        # Append-only table: a BRIN index on insert time stays tiny for range scans over years of history
+        conn.execute(text("CREATE INDEX CONCURRENTLY IF NOT EXISTS brin_transactions_timestamp ON transactions USING brin (timestamp)"))
+
+def _idempotency_key(conn, dialect):
+    # Lets the checkout journal re-send a batch after a crash without duplicating sales
+    if "idempotency_key" not in {c["name"] for c in inspect(conn).get_columns("transactions")}:
+        conn.execute(text("ALTER TABLE transactions ADD COLUMN idempotency_key VARCHAR"))
+    concurrently = "CONCURRENTLY " if dialect == "postgresql" else ""
+    _drop_invalid(conn, dialect, "ux_transactions_idempotency_key")
+    conn.execute(text(f"CREATE UNIQUE INDEX {concurrently}IF NOT EXISTS ux_transactions_idempotency_key ON transactions (idempotency_key)"))
+
+def _price_history(conn, dialect):
+    # As-of lookups walk (name, valid_from); on Postgres, range joins from reports use a GiST index on the range.
+    # Existing prices open the history, valid since the epoch.
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_price_history_name_from ON product_price_history (product_name, valid_from)"))
+    conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ux_price_history_open ON product_price_history (product_name) WHERE valid_to IS NULL"))
+    if dialect == "postgresql":
+        conn.execute(text("CREATE INDEX IF NOT EXISTS gist_price_history_range ON product_price_history USING gist (tsrange(valid_from, valid_to))"))
+    conn.execute(text("INSERT INTO product_price_history (product_name, price, valid_from) SELECT name, price, :epoch FROM products "
+                      "WHERE name NOT IN (SELECT product_name FROM product_price_history)"), {"epoch": datetime(1970, 1, 1)})
+
+def _sales_rollup(conn, dialect):
+    # Under the migration lock, so concurrent workers can't both fill an empty rollup. Its own session:
+    # the two INSERT ... SELECTs commit together, which this AUTOCOMMIT connection can't give them.
+    sales_rollup.backfill()
+
+MIGRATIONS = [
+    (1, "transaction timestamp / FK indexes", _transaction_indexes),
+    (2, "transactions.idempotency_key", _idempotency_key),
+    (3, "product_price_history indexes and backfill", _price_history),
+    (4, "sales_rollup backfill", _sales_rollup),
+]
+
+LOCK_ID = 7_000_001 # pg_advisory_lock key: one uvicorn worker migrates, the others wait
+
+def _lock(conn):
+    # Poll rather than block in pg_advisory_lock: a waiter stuck inside that statement holds a snapshot, which
+    # the holder's CREATE INDEX CONCURRENTLY waits out, and Postgres breaks the cycle as a deadlock
+    while not conn.execute(text("SELECT pg_try_advisory_lock(:id)"), {"id": LOCK_ID}).scalar():
+        time.sleep(0.5)
+
+def migrate():
+    dialect = engine.dialect.name
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("CREATE TABLE IF NOT EXISTS schema_migrations (version INTEGER PRIMARY KEY, name VARCHAR, applied_at TIMESTAMP)"))
+        if dialect == "postgresql":
+            _lock(conn)
+        try:
+            done = {v for (v,) in conn.execute(text("SELECT version FROM schema_migrations"))}
+            for version, name, step in MIGRATIONS:
+                if version in done: continue
+                step(conn, dialect)
+                conn.execute(text("INSERT INTO schema_migrations (version, name, applied_at) VALUES (:v, :n, :t)"),
+                             {"v": version, "n": name, "t": datetime.utcnow()})
+                print(f"✅ Migration {version}: {name}")
+        finally:
+            if dialect == "postgresql":
+                conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": LOCK_ID})
@@ -0,0 +1,18 @@
+import asyncio
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from ..services import profiler
+
+router = APIRouter()
+
+@router.post("/admin/profile")
+async def profile(seconds: float = Query(10, gt=0, le=profiler.MAX_SECONDS), interval_ms: float = Query(10, ge=1, le=1000),
+                  path: str = None):
+    # Samples every thread for `seconds` (or, with path, only while requests under that prefix are running) and
+    # answers with collapsed stacks: pipe into flamegraph.pl or drop into speedscope
+    try:
+        p = profiler.start(seconds, interval_ms / 1000, path)
+    except profiler.Busy:
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    await asyncio.wrap_future(p.done)
+    return PlainTextResponse(p.collapsed(), headers={"X-Profile-Samples": str(p.samples)})
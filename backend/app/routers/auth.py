@@ -1,33 +1,130 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+import os
+from fastapi import APIRouter, Depends, Header, HTTPException
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from passlib.context import CryptContext
-from jose import jwt
+from jose import jwt, JWTError
+from sqlalchemy.exc import DBAPIError
 from datetime import datetime, timedelta
-from ..database import get_db, User
+from ..database import SessionLocal, User
+from ..services import auth_cache
+from ..services.password_pool import pool as password_pool, PoolBusy
 
 router = APIRouter()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 SECRET_KEY = "secret"
 ALGORITHM = "HS256"
+ADMIN_USERS = {u.strip() for u in os.getenv("ADMIN_USERS", "").split(",") if u.strip()} # Usernames allowed on /api/admin
 
 class UserAuth(BaseModel):
     username: str
     password: str
 
+class PasswordChange(BaseModel):
+    old_password: str
+    new_password: str
+
+# Handlers stay async: the DB bits are short threadpool hops, bcrypt waits on the password pool
+def _find_user(username):
+    db = SessionLocal()
+    try:
+        return db.query(User).filter(User.username == username).first()
+    finally:
+        db.close()
+
+def _save_password(username, hashed):
+    db = SessionLocal()
+    try:
+        u = db.query(User).filter(User.username == username).first()
+        if u: u.hashed_password = hashed
+        else: db.add(User(username=username, hashed_password=hashed))
+        db.commit()
+    finally:
+        db.close()
+
+async def _pooled(call):
+    try:
+        return await call
+    except PoolBusy:
+        raise HTTPException(status_code=503, detail="Too many logins, retry", headers={"Retry-After": "1"})
+
+def issue_token(u):
+    return jwt.encode({"sub": u.username, "pwv": auth_cache.password_version(u.hashed_password), "exp": datetime.utcnow() + timedelta(hours=2)}, SECRET_KEY, algorithm=ALGORITHM)
+
 @router.post("/register")
-def register(user: UserAuth, db: Session = Depends(get_db)):
-    if db.query(User).filter(User.username == user.username).first():
+async def register(user: UserAuth):
+    if await run_in_threadpool(_find_user, user.username):
         return {"msg": "User exists (OK)"} 
-    hashed = pwd_context.hash(user.password)
-    db.add(User(username=user.username, hashed_password=hashed))
-    db.commit()
+    hashed = await _pooled(password_pool.hash(user.password))
+    await run_in_threadpool(_save_password, user.username, hashed)
     return {"msg": "Created"}
 
 @router.post("/token")
-def login(user: UserAuth, db: Session = Depends(get_db)):
-    u = db.query(User).filter(User.username == user.username).first()
-    if not u or not pwd_context.verify(user.password, u.hashed_password):
+async def login(user: UserAuth):
+    u = await run_in_threadpool(_find_user, user.username)
+    if not u or not await _pooled(password_pool.verify(user.password, u.hashed_password)):
         raise HTTPException(status_code=400, detail="Incorrect")
-    token = jwt.encode({"sub": u.username, "exp": datetime.utcnow() + timedelta(hours=2)}, SECRET_KEY, algorithm=ALGORITHM)
-    return {"access_token": token, "token_type": "bearer"}
\ No newline at end of file
+    return {"access_token": issue_token(u), "token_type": "bearer"}
+
+# --- Token verification (shared by the pos, products and dashboard routers) ---
+def _unauthorized(detail="Not authenticated"):
+    return HTTPException(status_code=401, detail=detail, headers={"WWW-Authenticate": "Bearer"})
+
+def _decode(token):
+    key = auth_cache.token_key(token)
+    claims = auth_cache.claims.get(key)
+    if claims is None:
+        try:
+            claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
+            raise _unauthorized("Invalid token")
+        auth_cache.claims.put(key, claims, claims.get("exp")) # Dropped no later than the token expires
+    return claims
+
+def _load_user(username):
+    db = SessionLocal()
+    try:
+        u = db.query(User).filter(User.username == username).first()
+        return u and {"id": u.id, "username": u.username, "pwv": auth_cache.password_version(u.hashed_password)}
+    finally:
+        db.close()
+
+async def get_current_user(authorization: str = Header(None)):
+    # Cache hits cost a hash and two dict lookups; only a cold user touches the DB (off the event loop)
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise _unauthorized()
+    claims = _decode(token)
+    user = auth_cache.users.get(claims.get("sub"))
+    if user is None:
+        try:
+            user = await run_in_threadpool(_load_user, claims.get("sub"))
+        except DBAPIError:
+            # DB unreachable: the token's signature is good, so the last entry we had keeps the tills (and the
+            # checkout journal) working through the outage; its pwv still gets checked below
+            user = auth_cache.users.stale(claims.get("sub"))
+            if user is None:
+                raise HTTPException(status_code=503, detail="User store unavailable", headers={"Retry-After": "5"})
+        else:
+            if user is None:
+                raise _unauthorized("Unknown user")
+            auth_cache.users.put(user["username"], user)
+    if claims.get("pwv") != user["pwv"]: # Issued before the last password change
+        raise _unauthorized("Token revoked")
+    return user
+
+async def require_admin(user=Depends(get_current_user)):
+    if user["username"] not in ADMIN_USERS:
+        raise HTTPException(status_code=403, detail="Admin only")
+    return user
+
+@router.put("/password")
+async def change_password(p: PasswordChange, user=Depends(get_current_user)):
+    u = await run_in_threadpool(_find_user, user["username"])
+    if not await _pooled(password_pool.verify(p.old_password, u.hashed_password)):
+        raise HTTPException(status_code=400, detail="Incorrect")
+    await run_in_threadpool(_save_password, u.username, await _pooled(password_pool.hash(p.new_password)))
+    auth_cache.users.pop(u.username) # Old tokens now fail the pwv check on this worker
+    return {"msg": "Updated"}
+
+@router.get("/stats")
+def pool_stats(user=Depends(get_current_user)):
+    return password_pool.stats()
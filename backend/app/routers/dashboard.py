@@ -1,18 +1,77 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from ..database import get_db, Transaction
-from datetime import date
+from sqlalchemy import func, select
+from typing import Optional
+from ..database import get_db, get_async_db, async_engine, Transaction, TransactionItem, SalesRollup, ProductPriceHistory
+from ..services.sales_rollup import STORE_ID, ALL_PRODUCTS
+from ..services.price_history import covers
+from datetime import date, datetime, time, timedelta
 
 router = APIRouter()
 
-@router.get("/daily")
-def get_daily_sales(db: Session = Depends(get_db)):
-    today = date.today()
-    total = db.query(func.sum(Transaction.total_amount)).filter(func.date(Transaction.timestamp) == today).scalar() or 0
-    count = db.query(Transaction).filter(func.date(Transaction.timestamp) == today).count()
-    recent = db.query(Transaction).order_by(Transaction.timestamp.desc()).limit(5).all()
+def _daily_queries():
+    # Totals come from the rollup: at most 24 x cashiers rows per day, whatever the history size
+    today = datetime.utcnow().date()
+    totals = select(func.sum(SalesRollup.sales), func.sum(SalesRollup.txn_count)).where(
+        SalesRollup.store_id == STORE_ID, SalesRollup.day == today, SalesRollup.product_name == ALL_PRODUCTS)
+    recent = select(Transaction).order_by(Transaction.timestamp.desc()).limit(5)
+    return totals, recent
+
+def _daily_response(totals, recent):
+    total, count = totals
     return {
-        "total_sales": total, "transaction_count": count,
+        "total_sales": total or 0, "transaction_count": count or 0,
         "recent_txns": [{"id": t.id, "time": t.timestamp, "amount": t.total_amount, "cashier": t.cashier_name} for t in recent]
-    }
\ No newline at end of file
+    }
+
+def get_daily_sales(db: Session = Depends(get_db)):
+    totals, recent = _daily_queries()
+    return _daily_response(db.execute(totals).one(), db.scalars(recent).all())
+
+async def get_daily_sales_async(db=Depends(get_async_db)):
+    totals, recent = _daily_queries()
+    return _daily_response((await db.execute(totals)).one(), (await db.scalars(recent)).all())
+
+router.add_api_route("/daily", get_daily_sales_async if async_engine else get_daily_sales, methods=["GET"])
+
+def _date_range(start, end, days):
+    # Inclusive dates from the query string become a half-open [start, stop) range on the column
+    end = end or datetime.utcnow().date()
+    return start or end - timedelta(days=days - 1), end + timedelta(days=1)
+
+@router.get("/sales/daily")
+def get_sales_by_day(start: Optional[date] = None, end: Optional[date] = None, days: int = 7, db: Session = Depends(get_db)):
+    start, stop = _date_range(start, end, days)
+    rows = db.execute(
+        select(SalesRollup.day, func.sum(SalesRollup.sales), func.sum(SalesRollup.txn_count))
+        .where(SalesRollup.store_id == STORE_ID, SalesRollup.day >= start, SalesRollup.day < stop, SalesRollup.product_name == ALL_PRODUCTS)
+        .group_by(SalesRollup.day).order_by(SalesRollup.day)
+    ).all()
+    return [{"day": d, "total_sales": total, "transaction_count": count} for d, total, count in rows]
+
+@router.get("/sales/products")
+def get_sales_by_product(start: Optional[date] = None, end: Optional[date] = None, days: int = 30, db: Session = Depends(get_db)):
+    start, stop = _date_range(start, end, days)
+    rows = db.execute(
+        select(SalesRollup.product_name, func.sum(SalesRollup.kg), func.sum(SalesRollup.items), func.sum(SalesRollup.sales))
+        .where(SalesRollup.store_id == STORE_ID, SalesRollup.day >= start, SalesRollup.day < stop, SalesRollup.product_name != ALL_PRODUCTS)
+        .group_by(SalesRollup.product_name).order_by(func.sum(SalesRollup.kg).desc())
+    ).all()
+    return [{"product": name, "kg": kg, "items": items, "total_sales": total} for name, kg, items, total in rows]
+
+@router.get("/sales/price_audit")
+def get_price_audit(start: Optional[date] = None, end: Optional[date] = None, days: int = 30, db: Session = Depends(get_db)):
+    # What was charged vs. the catalog price in effect at sale time (promotions, stale or edited client prices).
+    # One range join against the price history instead of a lookup per item.
+    start, stop = _date_range(start, end, days)
+    h = ProductPriceHistory
+    list_sales = func.sum(TransactionItem.weight * TransactionItem.quantity * h.price)
+    rows = db.execute(
+        select(TransactionItem.product_name, func.count(), func.sum(TransactionItem.total_price), list_sales)
+        .join(Transaction, TransactionItem.transaction_id == Transaction.id)
+        .join(h, (h.product_name == TransactionItem.product_name) & covers(db.bind.dialect.name, Transaction.timestamp))
+        .where(Transaction.timestamp >= datetime.combine(start, time()), Transaction.timestamp < datetime.combine(stop, time()))
+        .group_by(TransactionItem.product_name).order_by(TransactionItem.product_name)
+    ).all()
+    return [{"product": name, "items": n, "charged": round(charged, 2), "list": round(listed, 2), "difference": round(charged - listed, 2)}
+            for name, n, charged, listed in rows]
@@ -1,47 +1,205 @@
-from fastapi import APIRouter, Depends, UploadFile, File
+import asyncio
+from fastapi import APIRouter, Depends, UploadFile, File, Header, HTTPException, Request, Response
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import insert, select
+from sqlalchemy.exc import DBAPIError, IntegrityError
 from sqlalchemy.orm import Session
-from pydantic import BaseModel
-from typing import List
-from ..services import hardware, ai_service
-from ..database import get_db, Transaction, TransactionItem, Product
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from datetime import datetime
+from ..services import hardware, ai_service, price_catalog, sales_rollup, frame_gate, checkout_journal, idempotency, pricing, startup
+from ..database import get_db, get_async_db, async_engine, SessionLocal, Transaction, TransactionItem
 
 router = APIRouter()
 
-@router.get("/status")
-def get_status(db: Session = Depends(get_db)):
-    data = hardware.get_weight_data()
-    # Fetch Real-time prices from DB
-    products = db.query(Product).all()
-    prices = {p.name: p.price for p in products}
-    return {**data, "prices": prices}
-
-@router.post("/predict")
-def predict(file: UploadFile = File(...)):
-    res = ai_service.predict_image()
+# Per route, so a scale that hasn't attached yet doesn't hold up checkout (the catalog implies the DB was up)
+def _needs(*names):
+    return [Depends(startup.requires(*names))]
+
+def _weight_data(lane):
+    try: return hardware.get_weight_data(lane)
+    except KeyError: raise HTTPException(status_code=404, detail=f"Unknown lane {lane}")
+
+@router.get("/status", dependencies=_needs("catalog", "scale"))
+async def get_status(request: Request, response: Response, lane: str = None):
+    data = _weight_data(lane)
+    # Prices come from the in-memory catalog; skip them if the client already has this version
+    prices, etag = await price_catalog.catalog.asnapshot()
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-store" # Weight is live; only the prices are conditional
+    if request.headers.get("If-None-Match") == etag:
+        return {**data, "prices_etag": etag}
+    return {**data, "prices": prices, "prices_etag": etag}
+
+@router.get("/scale/history", dependencies=_needs("scale"))
+def scale_history(seconds: float = 10, lane: str = None):
+    # Diagnostics: raw samples and the stability detector's view of them
+    _weight_data(lane)
+    return hardware.get_history(seconds, lane)
+
+@router.post("/predict", dependencies=_needs("model", "scale"))
+async def predict(request: Request, file: UploadFile = File(None), x_frame_shape: str = Header(None),
+                  x_terminal_id: str = Header(None), lane: str = None):
+    # Either a multipart image upload, or a raw pre-scaled frame (application/octet-stream + X-Frame-Shape)
+    img = None
+    if ai_service.model is not None:
+        if file is not None:
+            img = await run_in_threadpool(ai_service.decode_upload, file.file)
+        elif x_frame_shape:
+            try: img = ai_service.decode_raw(await request.body(), x_frame_shape)
+            except ValueError as e: raise HTTPException(status_code=400, detail=str(e))
+    if img is None:
+        return {"result": await asyncio.wrap_future(ai_service.submit(None))}
+    # Same produce still on the scale: answer from the terminal's last result
+    weight = _weight_data(lane)["weight"]
+    terminal = lane or x_terminal_id or request.client.host
+    cached, key = frame_gate.gate.lookup(terminal, img, weight)
+    if cached is not None:
+        return {"result": cached}
+    res = await asyncio.wrap_future(ai_service.submit(img))
+    frame_gate.gate.store(terminal, key, res)
     return {"result": res}
 
+@router.get("/predict/stats")
+def predict_stats():
+    return {**ai_service.batcher.stats(), "frame_gate": frame_gate.gate.stats()}
+
 class CartItem(BaseModel):
     name: str
-    weight: float
+    weight: float = Field(ge=0) # kg
     price: float
-    qty: int
+    qty: int = Field(ge=1)
     total: float
 
 class CheckoutRequest(BaseModel):
     items: List[CartItem]
     total: float
     cashier: str
+    idempotency_key: Optional[str] = None # Or the Idempotency-Key header
 
-@router.post("/checkout")
-def checkout(req: CheckoutRequest, db: Session = Depends(get_db)):
-    txn = Transaction(total_amount=req.total, cashier_name=req.cashier)
-    db.add(txn)
-    db.commit()
-    db.refresh(txn)
-    for item in req.items:
-        db.add(TransactionItem(
-            transaction_id=txn.id, product_name=item.name, weight=item.weight,
-            price_per_unit=item.price, quantity=item.qty, total_price=item.total
-        ))
+def _checkout_header(req, ts, key=None):
+    return insert(Transaction).values(timestamp=ts, total_amount=req.total, cashier_name=req.cashier,
+                                      idempotency_key=key).returning(Transaction.id)
+
+def _checkout_items(req, txn_id):
+    return [{
+        "transaction_id": txn_id, "product_name": item.name, "weight": item.weight,
+        "price_per_unit": item.price, "quantity": item.qty, "total_price": item.total
+    } for item in req.items]
+
+def _replayed(txn_id):
+    return {"msg": "Saved", "txn_id": txn_id, "replayed": True}
+
+# One DB transaction: header id via RETURNING, every item in one batched INSERT, rollup upsert.
+# A key the unique index has already seen is a replay: answer with the original txn_id.
+def checkout(req: CheckoutRequest, db: Session, key=None):
+    ts = datetime.utcnow()
+    try:
+        txn_id = db.execute(_checkout_header(req, ts, key)).scalar_one()
+    except IntegrityError:
+        db.rollback()
+        return _replayed(db.scalar(select(Transaction.id).where(Transaction.idempotency_key == key)))
+    if req.items:
+        db.execute(insert(TransactionItem), _checkout_items(req, txn_id))
+    db.execute(sales_rollup.upsert(db.bind.dialect.name, sales_rollup.rollup_rows(req, ts)))
     db.commit()
-    return {"msg": "Saved", "txn_id": txn.id}
\ No newline at end of file
+    return {"msg": "Saved", "txn_id": txn_id}
+
+async def checkout_async(req: CheckoutRequest, db, key=None):
+    ts = datetime.utcnow()
+    try:
+        txn_id = (await db.execute(_checkout_header(req, ts, key))).scalar_one()
+    except IntegrityError:
+        await db.rollback()
+        return _replayed(await db.scalar(select(Transaction.id).where(Transaction.idempotency_key == key)))
+    if req.items:
+        await db.execute(insert(TransactionItem), _checkout_items(req, txn_id))
+    await db.execute(sales_rollup.upsert(db.bind.dialect.name, sales_rollup.rollup_rows(req, ts)))
+    await db.commit()
+    return {"msg": "Saved", "txn_id": txn_id}
+
+def _checkout_now(req, key):
+    db = SessionLocal()
+    try: return checkout(req, db, key)
+    finally: db.close()
+
+# Route handlers: a key seen in the last few minutes is answered from the dedup cache before any write.
+# Prices and totals are recomputed server-side; the response says which lines the client had wrong.
+def _reprice(table, req):
+    try: return pricing.reprice(table, req)
+    except ValueError as e: raise HTTPException(status_code=400, detail=str(e))
+
+def _priced(res, req, repaired):
+    return {**res, "total": req.total, "repaired": repaired}
+
+def post_checkout(req: CheckoutRequest, db: Session = Depends(get_db), idempotency_key: Optional[str] = Header(None)):
+    key = idempotency_key or req.idempotency_key
+    def write():
+        repaired = _reprice(pricing.engine.current(), req)
+        return _priced(checkout(req, db, key), req, repaired)
+    return idempotency.cache.run(key, write)
+
+async def post_checkout_async(req: CheckoutRequest, db=Depends(get_async_db), idempotency_key: Optional[str] = Header(None)):
+    key = idempotency_key or req.idempotency_key
+    async def write():
+        repaired = _reprice(await pricing.engine.acurrent(), req)
+        return _priced(await checkout_async(req, db, key), req, repaired)
+    return await idempotency.cache.arun(key, write)
+
+async def checkout_journaled(req: CheckoutRequest, idempotency_key: Optional[str] = Header(None)):
+    # Acknowledged once the sale is fsync'd locally; the journal syncer writes it to the DB (and skips keys it has).
+    # Priced here, so the journal holds the amounts the customer was charged.
+    key = idempotency_key or req.idempotency_key
+    fresh = False
+    async def write():
+        nonlocal fresh
+        fresh = True
+        repaired = _reprice(await pricing.engine.acurrent(), req)
+        if checkout_journal.journal is None: # Journal held by another worker
+            return _priced(await run_in_threadpool(_checkout_now, req, key), req, repaired)
+        saved = await checkout_journal.journal.append(req.model_dump(exclude={"idempotency_key"}), key)
+        return _priced({"msg": "Saved", "txn_id": None, "pending": True, "key": saved}, req, repaired)
+    res = await idempotency.cache.arun(key, write)
+    if fresh or not res.get("pending"):
+        return res
+    # Replay of a journaled sale: its txn_id once the syncer has written it, still pending until then
+    try: txn_id = await run_in_threadpool(_synced_txn_id, key)
+    except DBAPIError: txn_id = None
+    return {**res, **_replayed(txn_id), "pending": txn_id is None}
+
+def _synced_txn_id(key):
+    db = SessionLocal()
+    try: return db.scalar(select(Transaction.id).where(Transaction.idempotency_key == key))
+    finally: db.close()
+
+def sync_journal(records):
+    # Journal sink: a whole batch in one DB transaction; keys the DB already has (a re-sent batch) are skipped
+    db = SessionLocal()
+    try:
+        keys = [r["key"] for r in records]
+        done = set(db.scalars(select(Transaction.idempotency_key).where(Transaction.idempotency_key.in_(keys))))
+        sales = {r["key"]: (datetime.fromisoformat(r["ts"]), CheckoutRequest.model_validate(r["sale"]))
+                 for r in records if r["key"] not in done}
+        if sales:
+            headers = [{"timestamp": ts, "total_amount": req.total, "cashier_name": req.cashier, "idempotency_key": key}
+                       for key, (ts, req) in sales.items()]
+            ids = db.scalars(insert(Transaction).returning(Transaction.id, sort_by_parameter_order=True), headers).all()
+            items = [row for (_, req), txn_id in zip(sales.values(), ids) for row in _checkout_items(req, txn_id)]
+            if items:
+                db.execute(insert(TransactionItem), items)
+            db.execute(sales_rollup.upsert(db.bind.dialect.name, sales_rollup.merge(
+                [row for ts, req in sales.values() for row in sales_rollup.rollup_rows(req, ts)])))
+        db.commit()
+    finally:
+        db.close()
+
+if checkout_journal.ENABLED:
+    router.add_api_route("/checkout", checkout_journaled, methods=["POST"], dependencies=_needs("journal", "catalog"))
+else:
+    router.add_api_route("/checkout", post_checkout_async if async_engine else post_checkout, methods=["POST"],
+                         dependencies=_needs("journal", "catalog"))
+
+@router.get("/checkout/journal", dependencies=_needs("journal"))
+def journal_stats():
+    return {**(checkout_journal.journal.stats() if checkout_journal.journal else {"enabled": False}),
+            "idempotency_cache": idempotency.cache.stats()}
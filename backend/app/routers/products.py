@@ -1,23 +1,96 @@
 # [NEW] API for Managing Prices
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from pydantic import BaseModel
-from ..database import get_db, Product
+from pydantic import BaseModel, Field, model_validator
+from typing import Optional
+from datetime import date, datetime
+from ..database import get_db, Product, Promotion
+from ..services import price_catalog, price_bulk, price_history
 
 router = APIRouter()
 
 class ProductUpdate(BaseModel):
     price: float
 
+class PromotionIn(BaseModel):
+    product_name: Optional[str] = None # None = every product
+    percent_off: float = Field(gt=0, le=100)
+    start_hour: Optional[int] = Field(None, ge=0, le=23) # e.g. 18-21 for an evening markdown
+    end_hour: Optional[int] = Field(None, ge=0, le=23)
+    min_weight: Optional[float] = Field(None, ge=0)
+    valid_from: Optional[date] = None
+    valid_to: Optional[date] = None
+
+    @model_validator(mode="after")
+    def _window(self):
+        # Both hours or neither (all day); start == end would be an empty window
+        if (self.start_hour is None) != (self.end_hour is None):
+            raise ValueError("Give both start_hour and end_hour, or neither for all day")
+        if self.start_hour is not None and self.start_hour == self.end_hour:
+            raise ValueError("start_hour and end_hour must differ (omit both for all day)")
+        if self.valid_from and self.valid_to and self.valid_from > self.valid_to:
+            raise ValueError("valid_from is after valid_to")
+        return self
+
 @router.get("/products")
 def get_products(db: Session = Depends(get_db)):
     return db.query(Product).all()
 
+# Bulk: a whole price list (CSV, NDJSON or JSON body) in one transaction and one invalidation
+@router.post("/products/prices")
+async def import_prices(request: Request):
+    try:
+        prices = await price_bulk.read_prices(request.stream(), request.headers.get("content-type", ""))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    updated = await run_in_threadpool(price_bulk.apply, prices)
+    return {"msg": "Updated", "updated": len(updated), "not_found": sorted(set(prices) - set(updated))}
+
+@router.get("/products/prices")
+def export_prices(format: str = "csv"):
+    if format not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="format is csv or ndjson")
+    return StreamingResponse(price_bulk.export(format), media_type="text/csv" if format == "csv" else "application/x-ndjson",
+                             headers={"Content-Disposition": f"attachment; filename=prices.{format}"})
+
+@router.get("/products/{name}/price")
+def get_price_as_of(name: str, at: Optional[datetime] = None):
+    # Catalog price in effect at `at` (naive = UTC; default now)
+    found = price_history.history.as_of(name, at or datetime.utcnow())
+    if found is None:
+        raise HTTPException(status_code=404, detail=f"No price for {name} at that time")
+    return found
+
 @router.put("/products/{name}")
 def update_price(name: str, p: ProductUpdate, db: Session = Depends(get_db)):
     product = db.query(Product).filter(Product.name == name).first()
     if product:
         product.price = p.price
+        price_history.record(db, {name: p.price})
+        price_catalog.publish_change(db)
         db.commit()
         return {"msg": "Updated"}
-    return {"msg": "Not found"}
\ No newline at end of file
+    return {"msg": "Not found"}
+
+# Promotions ride on the price catalog's invalidation, so every worker's pricing table is rebuilt on commit
+@router.get("/promotions")
+def get_promotions(db: Session = Depends(get_db)):
+    return db.query(Promotion).all()
+
+@router.post("/promotions")
+def add_promotion(p: PromotionIn, db: Session = Depends(get_db)):
+    promo = Promotion(**p.model_dump())
+    db.add(promo)
+    price_catalog.publish_change(db)
+    db.commit()
+    return {"msg": "Created", "id": promo.id}
+
+@router.delete("/promotions/{promo_id}")
+def delete_promotion(promo_id: int, db: Session = Depends(get_db)):
+    if not db.query(Promotion).filter(Promotion.id == promo_id).delete():
+        return {"msg": "Not found"}
+    price_catalog.publish_change(db)
+    db.commit()
+    return {"msg": "Deleted"}
@@ -0,0 +1,44 @@
+# [NEW] Live scale stream (replaces polling /api/status for weight)
+import asyncio
+import json
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from ..services import hardware
+from ..services.scale_stream import broadcaster
+
+router = APIRouter()
+
+@router.websocket("/ws/scale")
+async def scale_ws(ws: WebSocket, lane: str = None):
+    lane = lane or hardware.manager.default_lane
+    if lane not in hardware.manager.lanes:
+        await ws.close(code=4404)
+        return
+    await ws.accept()
+    q = broadcaster.subscribe(lane)
+    try:
+        while True:
+            await ws.send_json(await q.get())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        broadcaster.unsubscribe(lane, q)
+
+@router.get("/api/scale/stream")
+async def scale_sse(lane: str = None):
+    # SSE fallback for clients/proxies without WebSocket support
+    lane = lane or hardware.manager.default_lane
+    if lane not in hardware.manager.lanes:
+        raise HTTPException(status_code=404, detail=f"Unknown lane {lane}")
+    async def events():
+        q = broadcaster.subscribe(lane)
+        try:
+            while True:
+                try:
+                    data = await asyncio.wait_for(q.get(), timeout=15)
+                    yield f"data: {json.dumps(data)}\n\n"
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+        finally:
+            broadcaster.unsubscribe(lane, q)
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-store"})
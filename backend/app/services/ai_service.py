@@ -1,9 +1,241 @@
+import os
+import queue
 import random
+import struct
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+import cv2
+from . import metrics
 # Note: Prices are now fetched from DB, this just predicts class
 CLASSES = ["Carrot", "Tomato", "Pumpkin", "Corn", "Red_Chili", "Bell_Pepper", "Cucumber", "Unknown"]
+MODEL_PATH = os.getenv("MODEL_PATH", os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "..", "model", "veggie_clf.npz")))
+MIN_CONFIDENCE = float(os.getenv("MIN_CONFIDENCE", "0.5")) # Below this the answer is "Unknown"
+MAX_BATCH = int(os.getenv("PREDICT_MAX_BATCH", "16"))
+MAX_WAIT_MS = float(os.getenv("PREDICT_MAX_WAIT_MS", "5"))
+UPLOAD_BUFFER_BYTES = int(os.getenv("UPLOAD_BUFFER_BYTES", str(1 << 20)))
 
-def predict_image():
-    # Mock Prediction
+# --- Features: HSV colour histogram + HOG on a 64x64 crop ---
+IMG_SIZE = 64
+HIST_BINS = [16, 4, 4]
+CELL, ORIENTATIONS = 16, 9
+_CELLS = IMG_SIZE // CELL
+_cy, _cx = np.indices((IMG_SIZE, IMG_SIZE)) // CELL
+_CELL_INDEX = ((_cy * _CELLS + _cx) * ORIENTATIONS).ravel()
+
+def hog(gray):
+    # Dalal-Triggs HOG (16x16 cells, 2x2 blocks, 9 unsigned bins) over a (N, 64, 64) stack;
+    # done in NumPy because cv2.HOGDescriptor is not in every OpenCV build we ship
+    n = len(gray)
+    gx = np.zeros_like(gray); gx[:, :, 1:-1] = gray[:, :, 2:] - gray[:, :, :-2]
+    gy = np.zeros_like(gray); gy[:, 1:-1, :] = gray[:, 2:, :] - gray[:, :-2, :]
+    mag = np.hypot(gx, gy)
+    bins = (np.degrees(np.arctan2(gy, gx)) % 180 * ORIENTATIONS / 180).astype(np.int64) % ORIENTATIONS
+    per_img = _CELLS * _CELLS * ORIENTATIONS
+    index = _CELL_INDEX + bins.reshape(n, -1) + np.arange(n)[:, None] * per_img
+    cells = np.bincount(index.ravel(), weights=mag.ravel(), minlength=n * per_img)
+    cells = cells.reshape(n, _CELLS, _CELLS, ORIENTATIONS)
+    blocks = np.concatenate([cells[:, :-1, :-1], cells[:, 1:, :-1], cells[:, :-1, 1:], cells[:, 1:, 1:]], axis=3)
+    blocks /= np.sqrt((blocks ** 2).sum(axis=3, keepdims=True)) + 1e-6
+    return blocks.reshape(n, -1)
+
+def extract_features_batch(imgs):
+    # One pass for the whole batch; OpenCV colour conversions run on the stack as one tall image
+    n = len(imgs)
+    small = np.stack([cv2.resize(img, (IMG_SIZE, IMG_SIZE), interpolation=cv2.INTER_AREA) for img in imgs])
+    tall = small.reshape(n * IMG_SIZE, IMG_SIZE, 3)
+    hsv = cv2.cvtColor(tall, cv2.COLOR_BGR2HSV).reshape(n, -1, 3).astype(np.int64)
+    hb, sb, vb = HIST_BINS
+    idx = (hsv[..., 0] * hb // 180) * (sb * vb) + (hsv[..., 1] * sb // 256) * vb + hsv[..., 2] * vb // 256
+    n_hist = hb * sb * vb
+    hist = np.bincount((idx + np.arange(n)[:, None] * n_hist).ravel(), minlength=n * n_hist)
+    hist = hist.reshape(n, n_hist).astype(np.float32)
+    hist /= hist.sum(axis=1, keepdims=True) + 1e-6
+    gray = cv2.cvtColor(tall, cv2.COLOR_BGR2GRAY).reshape(n, IMG_SIZE, IMG_SIZE).astype(np.float32)
+    return np.hstack([hist, hog(gray)]).astype(np.float32)
+
+def extract_features(img):
+    return extract_features_batch([img])[0]
+
+class Classifier:
+    # Linear softmax model; weights come from train_model.py, inference is plain NumPy
+    def __init__(self, classes, mean, scale, coef, intercept):
+        self.classes = list(classes)
+        self.mean, self.scale = mean, scale
+        self.coef, self.intercept = coef, intercept
+
+    @classmethod
+    def load(cls, path):
+        a = np.load(path)
+        return cls(a["classes"].tolist(), a["mean"], a["scale"], a["coef"], a["intercept"])
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        np.savez_compressed(path, classes=np.array(self.classes), mean=self.mean, scale=self.scale,
+                            coef=self.coef.astype(np.float32), intercept=self.intercept.astype(np.float32))
+
+    def predict_proba(self, X):
+        z = ((X - self.mean) / self.scale) @ self.coef.T + self.intercept
+        z = np.exp(z - z.max(axis=1, keepdims=True))
+        return z / z.sum(axis=1, keepdims=True)
+
+    def predict(self, X):
+        proba = self.predict_proba(X)
+        best = proba.argmax(axis=1)
+        return [self.classes[i] if proba[n, i] >= MIN_CONFIDENCE else "Unknown" for n, i in enumerate(best)]
+
+model = None
+
+class InferenceBatcher:
+    # Frames that arrive within MAX_WAIT_MS of each other share one feature/model pass
+    def __init__(self, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS):
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.queue = queue.Queue()
+        self.batches = 0
+        self.requests = 0
+        self.batch_sizes = [0] * (max_batch + 1) # batch_sizes[n] = batches of size n
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def submit(self, img):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="inference", daemon=True)
+                    self._thread.start()
+        fut = Future()
+        self.queue.put((img, fut, time.monotonic()))
+        return fut
+
+    def _collect(self):
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0: break
+            try: batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty: break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            start = time.monotonic()
+            for _, _, queued in batch:
+                metrics.inference_wait_seconds.observe(start - queued)
+            try:
+                results = model.predict(extract_features_batch([img for img, _, _ in batch]))
+                for (_, fut, _), res in zip(batch, results):
+                    fut.set_result(res)
+            except Exception as e:
+                for _, fut, _ in batch:
+                    fut.set_exception(e)
+            metrics.inference_batch_seconds.observe(time.monotonic() - start)
+            metrics.inference_batch_size.observe(len(batch))
+            self.batches += 1
+            self.requests += len(batch)
+            self.batch_sizes[len(batch)] += 1
+
+    def stats(self):
+        return {
+            "queue_depth": self.queue.qsize(), "batches": self.batches, "requests": self.requests,
+            "avg_batch_size": round(self.requests / self.batches, 2) if self.batches else 0,
+            "batch_size_histogram": {n: c for n, c in enumerate(self.batch_sizes) if c},
+        }
+
+batcher = InferenceBatcher()
+metrics.register(metrics.Gauge("inference_queue_depth", "Frames waiting for a batch", batcher.queue.qsize))
+
+def load():
+    # Once per process; keeps the model warm for every /api/predict call
+    global model
+    if os.path.exists(MODEL_PATH):
+        model = Classifier.load(MODEL_PATH)
+        print(f"✅ Classifier loaded ({len(model.classes)} classes)")
+    else:
+        print(f"⚠️ No model at {MODEL_PATH} (run train_model.py): using mock predictions")
+
+# --- Decoding: straight to (roughly) model resolution, without extra copies ---
+_REDUCED = [(8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2)]
+_buffers = threading.local()
+
+def image_size(data):
+    # (width, height) from the PNG IHDR or JPEG SOF header, without decoding
+    data = memoryview(data)
+    if bytes(data[:8]) == b"\x89PNG\r\n\x1a\n" and len(data) >= 24:
+        return struct.unpack(">II", data[16:24])
+    if bytes(data[:2]) != b"\xff\xd8":
+        return None
+    i = 2
+    while i + 9 < len(data):
+        if data[i] != 0xFF: return None
+        marker = data[i + 1]
+        if marker == 0xFF or marker == 0x01 or 0xD0 <= marker <= 0xD8: # fill byte / no-length markers
+            i += 1 if marker == 0xFF else 2
+            continue
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC): # SOFn
+            h, w = struct.unpack(">HH", data[i + 5:i + 9])
+            return w, h
+        i += 2 + struct.unpack(">H", data[i + 2:i + 4])[0]
+    return None
+
+def decode_flag(data):
+    # Largest libjpeg DCT downscale that still leaves IMG_SIZE pixels on the short side
+    size = image_size(data)
+    if size:
+        for factor, flag in _REDUCED:
+            if min(size) // factor >= IMG_SIZE:
+                return flag
+    return cv2.IMREAD_COLOR
+
+def decode(data):
+    buf = np.frombuffer(data, np.uint8)
+    return cv2.imdecode(buf, decode_flag(buf)) if len(buf) else None
+
+def decode_upload(f):
+    # Read the spooled upload into this thread's reusable buffer and decode from there
+    buf = getattr(_buffers, "buf", None) or bytearray(UPLOAD_BUFFER_BYTES)
+    view, n = memoryview(buf), 0
+    while True:
+        got = f.readinto(view[n:])
+        if not got: break
+        n += got
+        if n == len(buf): # Bigger than any frame so far: grow once, keep it for next time
+            view.release()
+            buf = buf + bytearray(len(buf))
+            view = memoryview(buf)
+    _buffers.buf = buf
+    try:
+        return decode(view[:n])
+    finally:
+        view.release()
+
+def decode_raw(data, shape):
+    # Pre-scaled frame from the terminal: "height,width,channels" of packed RGB or RGBA bytes
+    h, w, c = (int(x) for x in shape.split(","))
+    if c not in (3, 4) or h * w * c != len(data):
+        raise ValueError(f"Frame of {len(data)} bytes does not match shape {shape}")
+    img = np.frombuffer(data, np.uint8).reshape(h, w, c)
+    return cv2.cvtColor(img, cv2.COLOR_RGB2BGR if c == 3 else cv2.COLOR_RGBA2BGR)
+
+def mock_prediction():
     weights = [1] * (len(CLASSES)-1) + [0.1]
     result = random.choices(CLASSES, weights=weights, k=1)[0]
-    return result
\ No newline at end of file
+    return result
+
+def submit(img):
+    # Returns a Future; async callers wrap it with asyncio.wrap_future
+    if model is None:
+        fut = Future()
+        fut.set_result(mock_prediction()) # No trained model yet
+        return fut
+    if img is None:
+        fut = Future()
+        fut.set_result("Unknown")
+        return fut
+    return batcher.submit(img)
+
+def predict_image(data=None):
+    return submit(decode(data) if model is not None and data else None).result()
@@ -0,0 +1,20 @@
+# Token claims and users, cached so token checks don't decode + query on every poll
+import hashlib
+import os
+from .ttl_cache import TTLCache
+
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "1024"))
+TOKEN_CACHE_TTL = float(os.getenv("TOKEN_CACHE_TTL", "300")) # s, never past the token's own exp
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "256"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60")) # s, bounds staleness across workers
+
+def token_key(token):
+    # Raw tokens never sit in memory as dict keys
+    return hashlib.sha256(token.encode()).digest()
+
+def password_version(hashed_password):
+    # Short fingerprint of the stored hash; tokens carry it, so a password change revokes them
+    return hashlib.sha256(hashed_password.encode()).hexdigest()[:12]
+
+claims = TTLCache(TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL)
+users = TTLCache(USER_CACHE_SIZE, USER_CACHE_TTL)
@@ -0,0 +1,207 @@
+# Local write-ahead journal for checkout: a sale is safe once its line is fsync'd, the DB catches up in the background.
+# Format: one JSON object per line, {"key", "ts", "sale"}; "<journal>.offset" holds how many bytes the DB already has.
+import asyncio
+import fcntl
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from datetime import datetime
+from sqlalchemy.exc import DisconnectionError, InterfaceError, OperationalError
+
+JOURNAL_PATH = os.getenv("CHECKOUT_JOURNAL", os.path.join(os.path.dirname(__file__), "..", "..", "journal", "checkout.jsonl"))
+ENABLED = JOURNAL_PATH.lower() not in ("", "0", "off")
+SYNC_BATCH = int(os.getenv("JOURNAL_SYNC_BATCH", "200")) # sales per DB transaction
+COMPACT_BYTES = int(os.getenv("JOURNAL_COMPACT_BYTES", str(8 << 20))) # truncate once fully synced and this big
+MAX_BACKOFF = 30 # s between retries while the DB is down
+POISON_RETRIES = 3 # failed attempts at a batch, for reasons other than the DB being down, before it's bisected
+
+def _transient(e):
+    # DB unreachable or busy: wait it out. Anything else (validation, a non-key IntegrityError) is about the records.
+    return isinstance(e, (OSError, OperationalError, InterfaceError, DisconnectionError)) or getattr(e, "connection_invalidated", False)
+
+class CheckoutJournal:
+    def __init__(self, path, sink):
+        # sink(records) writes a batch to the DB and returns only after commit; keys make re-sending a batch harmless
+        self.path, self.sink = os.path.abspath(path), sink
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.f = open(self.path, "ab")
+        fcntl.flock(self.f, fcntl.LOCK_EX | fcntl.LOCK_NB) # BlockingIOError if another worker owns the journal
+        self.size = self._recover()
+        self.synced = min(self._read_offset(), self.size)
+        self._lock = threading.Lock() # Syncer's read/offset update vs. compaction
+        self.q = queue.Queue()
+        self.appended = threading.Event()
+        self.records = self.fsyncs = self.synced_records = self.sync_errors = self.rejected = 0
+        self.last_error = None
+        threading.Thread(target=self._write_loop, name="journal-writer", daemon=True).start()
+        threading.Thread(target=self._sync_loop, name="journal-sync", daemon=True).start()
+
+    def _recover(self):
+        # A crash mid-write leaves a torn last line; that sale was never acknowledged, so drop it
+        size = os.fstat(self.f.fileno()).st_size
+        end = size
+        with open(self.path, "rb") as r:
+            while end > 0:
+                start = max(0, end - 65536)
+                r.seek(start)
+                nl = r.read(end - start).rfind(b"\n")
+                if nl >= 0:
+                    end = start + nl + 1
+                    break
+                end = start
+        if end != size:
+            print(f"⚠️ Journal: dropped {size - end} bytes of torn write")
+            self.f.truncate(end)
+        return end
+
+    def _read_offset(self):
+        try:
+            with open(self.path + ".offset") as f:
+                return int(f.read() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def _write_offset(self, offset):
+        # No fsync: losing it only means re-sending sales the DB will skip by key
+        tmp = self.path + ".offset.tmp"
+        with open(tmp, "w") as f:
+            f.write(str(offset))
+        os.replace(tmp, self.path + ".offset")
+
+    def submit(self, sale, key=None):
+        # -> (key, Future resolved once the sale is on disk)
+        key = key or uuid.uuid4().hex
+        line = json.dumps({"key": key, "ts": datetime.utcnow().isoformat(), "sale": sale}, separators=(",", ":")).encode() + b"\n"
+        fut = Future()
+        self.q.put((line, fut))
+        return key, fut
+
+    async def append(self, sale, key=None):
+        key, fut = self.submit(sale, key)
+        await asyncio.wrap_future(fut)
+        return key
+
+    def _write_loop(self):
+        # Group commit: whatever queued up while the last fsync ran goes out in one write + fsync
+        while True:
+            batch = [self.q.get()]
+            while True:
+                try: batch.append(self.q.get_nowait())
+                except queue.Empty: break
+            if any(line is None for line, _ in batch):
+                self._compact()
+                batch = [b for b in batch if b[0] is not None]
+                if not batch: continue
+            data = b"".join(line for line, _ in batch)
+            try:
+                self.f.write(data)
+                self.f.flush()
+                os.fsync(self.f.fileno())
+            except OSError as e:
+                try: self.f.truncate(self.size) # Never leave a torn line ahead of the next append
+                except OSError: pass
+                for _, fut in batch: fut.set_exception(e)
+                continue
+            self.size += len(data)
+            self.records += len(batch)
+            self.fsyncs += 1
+            for _, fut in batch: fut.set_result(None)
+            self.appended.set()
+
+    def _compact(self):
+        with self._lock:
+            if self.synced != self.size:
+                return
+            self._write_offset(0) # Offset first: a crash in between only re-sends synced sales
+            self.f.truncate(0)
+            self.size = self.synced = 0
+
+    def _read_pending(self):
+        with open(self.path, "rb") as r:
+            r.seek(self.synced)
+            chunk = r.read(min(self.size - self.synced, 4 << 20))
+        records, consumed = [], 0
+        for line in chunk.split(b"\n")[:-1][:SYNC_BATCH]:
+            consumed += len(line) + 1
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                self.rejected += 1 # Unreadable line: skip it rather than block every sale behind it
+                print(f"⚠️ Journal: skipped unreadable record at byte {self.synced + consumed - len(line) - 1}")
+        return records, self.synced + consumed
+
+    def _isolate(self, records):
+        # Bisect a batch the sink keeps refusing: good halves sync, records that fail alone go to <journal>.rejected.
+        # Halves synced before a transient error are re-sent later and skipped by key.
+        try:
+            self.sink(records)
+            return
+        except Exception as e:
+            if _transient(e): raise
+            if len(records) == 1:
+                self._reject(records[0], e)
+                return
+        mid = len(records) // 2
+        self._isolate(records[:mid])
+        self._isolate(records[mid:])
+
+    def _reject(self, record, error):
+        with open(self.path + ".rejected", "ab") as f:
+            f.write(json.dumps({**record, "error": str(error)}, separators=(",", ":")).encode() + b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.rejected += 1
+        print(f"⚠️ Journal: set sale {record.get('key')} aside in {self.path}.rejected: {error}")
+
+    def _sync_loop(self):
+        backoff = 1
+        attempts = 0 # non-transient failures of the batch at self.synced
+        while True:
+            with self._lock:
+                records, end = self._read_pending() if self.synced < self.size else ([], self.synced)
+            if end == self.synced:
+                if self.size >= COMPACT_BYTES: self.q.put((None, None))
+                self.appended.wait(1)
+                self.appended.clear()
+                continue
+            try:
+                if records:
+                    if attempts >= POISON_RETRIES: self._isolate(records)
+                    else: self.sink(records)
+            except Exception as e:
+                if not _transient(e): attempts += 1
+                self.sync_errors += 1
+                self.last_error = str(e)
+                print(f"⚠️ Journal sync failed ({self.size - self.synced} bytes pending), retrying in {backoff}s: {e}")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, MAX_BACKOFF)
+                continue
+            backoff, attempts = 1, 0
+            with self._lock:
+                self.synced = end
+                self._write_offset(end)
+            self.synced_records += len(records)
+
+    def stats(self):
+        return {
+            "path": self.path, "records": self.records, "fsyncs": self.fsyncs,
+            "avg_group": round(self.records / self.fsyncs, 2) if self.fsyncs else 0,
+            "pending_bytes": self.size - self.synced, "synced_records": self.synced_records,
+            "sync_errors": self.sync_errors, "last_error": self.last_error, "rejected": self.rejected,
+        }
+
+journal = None
+
+def start(sink):
+    global journal
+    if not ENABLED:
+        return
+    try:
+        journal = CheckoutJournal(JOURNAL_PATH, sink)
+        print(f"✅ Checkout journal: {journal.path}")
+    except BlockingIOError:
+        print("⚠️ Checkout journal owned by another worker: this one checks out straight to the DB")
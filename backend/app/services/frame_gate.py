@@ -0,0 +1,49 @@
+# Skip inference when the terminal's frame and the scale weight haven't changed since the last answer
+import os
+import threading
+import time
+import cv2
+import numpy as np
+
+MAX_DISTANCE = int(os.getenv("FRAME_GATE_MAX_DISTANCE", "4")) # differing dHash bits (of 64)
+MAX_COLOR_DIFF = float(os.getenv("FRAME_GATE_MAX_COLOR_DIFF", "6")) # mean abs diff of an 8x8 colour thumbnail
+WEIGHT_DELTA = float(os.getenv("FRAME_GATE_WEIGHT_DELTA", "0.02")) # kg
+MAX_AGE = float(os.getenv("FRAME_GATE_MAX_AGE", "30")) # s, re-classify at least this often
+
+def fingerprint(img):
+    # 64-bit difference hash (layout) plus an 8x8 colour thumbnail (a tomato swapped for a carrot
+    # keeps the layout but not the colour)
+    small = cv2.resize(img, (9, 8), interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    dhash = int.from_bytes(np.packbits(gray[:, 1:] > gray[:, :-1]).tobytes(), "big")
+    return dhash, small[:, :8].astype(np.int16)
+
+def similar(a, b):
+    return bin(a[0] ^ b[0]).count("1") <= MAX_DISTANCE and np.abs(a[1] - b[1]).mean() <= MAX_COLOR_DIFF
+
+class FrameGate:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.last = {} # terminal -> (fingerprint, weight, result, time)
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, terminal, img, weight):
+        fp = fingerprint(img)
+        entry = self.last.get(terminal)
+        hit = entry is not None and abs(entry[1] - weight) < WEIGHT_DELTA \
+            and time.monotonic() - entry[3] < MAX_AGE and similar(entry[0], fp)
+        with self._lock:
+            if hit: self.hits += 1
+            else: self.misses += 1
+        return (entry[2] if hit else None), (fp, weight)
+
+    def store(self, terminal, key, result):
+        self.last[terminal] = (*key, result, time.monotonic())
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": round(self.hits / total, 3) if total else 0,
+                "terminals": len(self.last)}
+
+gate = FrameGate()
@@ -1,57 +1,267 @@
-import random
+import json
+import os
 import time
 import threading
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from .scale_sim import SimulatedScale, ReplayScale, TraceRecorder
+from . import metrics, scale_shm
+
+STABLE_WINDOW = int(os.getenv("SCALE_STABLE_WINDOW", "5")) # samples (10 Hz)
+STABLE_STD = float(os.getenv("SCALE_STABLE_STD", "0.02")) # kg
+HISTORY_SIZE = int(os.getenv("SCALE_HISTORY_SIZE", "600")) # 60 s at 10 Hz
+SAMPLE_INTERVAL = 0.1
+SHM_NAME = os.getenv("SCALE_SHM") # Set: the scale_reader daemon owns the devices, this process maps its shared memory
+READ_SPINS = 1000 # seqlock retries before a reading falls back to the last consistent one
+
+class SampleRing:
+    # Fixed-size ring of (time, weight) samples. One writer (the reader thread); readers copy
+    # without locking and retry if the writer lapped the slots they were copying.
+    # The arrays may be views into the scale_reader's shared memory.
+    def __init__(self, size, t=None, w=None, count=None):
+        self.size = size
+        self.t = np.zeros(size) if t is None else t
+        self.w = np.zeros(size) if w is None else w
+        self._count = np.zeros(1) if count is None else count # Samples ever written; bumped only after the slot is filled
+
+    @property
+    def count(self):
+        return int(self._count[0])
+
+    def push(self, ts, weight):
+        count = self.count
+        i = count % self.size
+        self.t[i] = ts
+        self.w[i] = weight
+        self._count[0] = count + 1
+
+    def snapshot(self, n=None):
+        # Newest n samples, oldest first
+        while True:
+            count = self.count
+            # At most size-1: the oldest slot is the one the writer fills next
+            n = min(n or self.size, count, self.size - 1)
+            idx = np.arange(count - n, count) % self.size
+            t, w = self.t[idx], self.w[idx] # Fancy indexing copies
+            # k more completed writes may also have started write k+1, which reaches the window once k >= size - n
+            if self.count - count < self.size - n:
+                return t, w
+
+def moving_stats(w, window=STABLE_WINDOW):
+    # Moving median / std over every full window of w, in one vectorized pass
+    if len(w) < window:
+        return np.empty(0), np.empty(0)
+    win = sliding_window_view(w, window)
+    return np.median(win, axis=1), win.std(axis=1)
 
 class HardwareState:
-    def __init__(self):
-        self.current_weight = 0.0
-        self.is_stable = True
-        self.tare_offset = 0.0
+    # record: float64 [seq, weight, is_stable, count, t ring, w ring], private or in shared memory.
+    # Seqlock: the writer makes seq odd, writes, makes it even again; readers retry on an odd or moved seq,
+    # so a reading is two memory loads, never a lock.
+    def __init__(self, record=None, history=HISTORY_SIZE):
+        if record is None:
+            record = np.zeros(scale_shm.record_size(history))
+            record[2] = 1.0 # (0.0, True) until the first sample
+        self._rec = record[:3]
+        self._last = (0.0, True)
+        f = scale_shm.STATE_FIELDS
+        self.samples = SampleRing(history, record[f:f + history], record[f + history:], record[3:4])
+
+    @property
+    def seq(self):
+        return int(self._rec[0])
 
-state = HardwareState()
+    @property
+    def reading(self):
+        # Bounded: a writer that died mid-write leaves seq odd, and this runs on the event loop
+        rec = self._rec
+        for _ in range(READ_SPINS):
+            seq = rec[0]
+            if seq % 2 == 0:
+                weight, stable = rec[1], rec[2]
+                if rec[0] == seq:
+                    self._last = float(weight), bool(stable)
+                    return self._last
+        return self._last
+
+    def _set(self, weight, stable):
+        rec = self._rec
+        rec[0] += 1
+        rec[1], rec[2] = weight, stable
+        rec[0] += 1
+
+    def publish(self, weight):
+        self.samples.push(time.time(), weight)
+        _, recent = self.samples.snapshot(STABLE_WINDOW)
+        median, std = moving_stats(recent)
+        if len(median):
+            self._set(round(float(median[-1]), 3), bool(std[-1] <= STABLE_STD))
+        else:
+            self._set(round(float(weight), 3), False)
+
+    @property
+    def current_weight(self):
+        return self.reading[0]
+
+    @property
+    def is_stable(self):
+        return self.reading[1]
 
 # --- Hardware Setup ---
-try:
-    import RPi.GPIO as GPIO
-    from hx711 import HX711
-    IS_RASPBERRY_PI = True
-    print("✅ Mode: Raspberry Pi (Real Sensor)")
-except ImportError:
-    IS_RASPBERRY_PI = False
-    print("⚠️ Mode: PC Simulation")
-
-def scale_reader():
-    if IS_RASPBERRY_PI:
+GPIO = HX711 = None
+IS_RASPBERRY_PI = None # Probed by the first DeviceManager that drives devices, not at import
+
+def _probe():
+    # Importing the Pi libraries probes the board: only the process that polls the scales pays for it,
+    # not API workers following the scale_reader, scripts or the bench
+    global GPIO, HX711, IS_RASPBERRY_PI
+    if IS_RASPBERRY_PI is None:
         try:
-            hx = HX711(dout_pin=5, pd_sck_pin=6)
-            hx.set_scale_ratio(1000) # Calibrate here
-            hx.reset()
-            state.tare_offset = 0
-            while True:
-                val = hx.get_weight_mean(5)
-                if val < 0.1: 
-                    state.current_weight = 0.0
-                    state.is_stable = True
-                else:
-                    diff = abs(val - state.current_weight)
-                    state.is_stable = diff < 0.1
-                    state.current_weight = float(val)
-                time.sleep(0.1)
-        except: pass
-    else:
-        # Simulation
-        state.tare_offset = 0.5 # Auto Tare
-        raw = 0.5
-        target = 0.5
-        while True:
-            if random.random() < 0.05: target = random.choice([0.5, 1.5, 3.0, 0.0])
-            diff = (target - raw) * 0.1
-            raw += diff + random.uniform(-0.02, 0.02)
-            state.is_stable = abs(diff) < 0.02
-            state.current_weight = max(0, round(raw - state.tare_offset, 2))
-            time.sleep(0.1)
+            import RPi.GPIO as gpio
+            from hx711 import HX711 as hx711
+            GPIO, HX711, IS_RASPBERRY_PI = gpio, hx711, True
+            print("✅ Mode: Raspberry Pi (Real Sensor)")
+        except ImportError:
+            IS_RASPBERRY_PI = False
+            print("⚠️ Mode: PC Simulation")
+    return IS_RASPBERRY_PI
+
+# One entry per lane; SCALE_CONFIG points at a JSON list of these. "device" is hx711, sim
+# (with "profile"/"seed") or replay (with "trace"); default hx711 on the Pi, sim elsewhere.
+DEFAULT_LANES = [{"lane": "1", "dout_pin": 5, "pd_sck_pin": 6, "scale_ratio": 1000, "tare": 0.0}]
 
-threading.Thread(target=scale_reader, daemon=True).start()
+def load_config():
+    path = os.getenv("SCALE_CONFIG")
+    if not path:
+        return DEFAULT_LANES
+    with open(path) as f:
+        return json.load(f)
 
-def get_weight_data():
-    return {"weight": state.current_weight, "is_stable": state.is_stable}
\ No newline at end of file
+class HX711Scale:
+    def __init__(self, cfg):
+        self.dout_pin = cfg["dout_pin"]
+        self.tare = cfg.get("tare", 0.0)
+        self.hx = HX711(dout_pin=cfg["dout_pin"], pd_sck_pin=cfg["pd_sck_pin"])
+        self.hx.set_scale_ratio(cfg.get("scale_ratio", 1000)) # Calibrate here
+        self.hx.reset()
+
+    def ready(self):
+        # DOUT goes low when a conversion is waiting, so reading never blocks the shared loop
+        return GPIO.input(self.dout_pin) == 0
+
+    def read(self):
+        val = self.hx.get_weight_mean(1)
+        if val is False: return None
+        val -= self.tare
+        return 0.0 if val < 0.1 else float(val)
+
+DEVICES = {"hx711": HX711Scale, "sim": SimulatedScale, "replay": ReplayScale}
+
+class DeviceManager:
+    # Every lane's scale, polled from one thread. records: per-lane shared-memory records (scale_reader),
+    # devices=False: only follow the lanes someone else is writing.
+    def __init__(self, config, records=None, devices=True):
+        self.lanes = {}
+        self.devices = {}
+        default = ("hx711" if _probe() else "sim") if devices else None
+        for cfg in config:
+            lane = str(cfg["lane"])
+            self.lanes[lane] = HardwareState(records[lane] if records else None)
+            if not devices: continue
+            try:
+                self.devices[lane] = DEVICES[cfg.get("device", default)](cfg)
+            except Exception as e:
+                print(f"⚠️ Scale for lane {lane} unavailable: {e}")
+        self.default_lane = str(config[0]["lane"])
+        record = os.getenv("SCALE_RECORD") if devices else None
+        self.recorder = TraceRecorder(record) if record else None
+
+    def poll(self):
+        for lane, device in self.devices.items():
+            try:
+                if not device.ready(): continue
+                val = device.read()
+            except Exception as e:
+                print(f"⚠️ Scale read failed on lane {lane}: {e}")
+                continue
+            if val is None: continue
+            if self.recorder: self.recorder.record(lane, val)
+            self.lanes[lane].publish(val)
+            _notify(lane)
+
+    def run(self):
+        paced(self.poll)
+
+def paced(step):
+    # The 10 Hz loop; how far each tick lands from its slot goes to the scale_loop_jitter_seconds histogram
+    due = time.monotonic()
+    while True:
+        tick = time.monotonic()
+        metrics.scale_jitter.observe(abs(tick - due))
+        step()
+        due = tick + SAMPLE_INTERVAL
+        time.sleep(max(0, due - time.monotonic()))
+
+manager = None
+state = None # Default lane, for single-scale setups
+shared = None
+listeners = [] # Called from the reader (or watcher) thread as callback(lane, data) after every sample
+
+def subscribe(callback):
+    listeners.append(callback)
+
+def _notify(lane):
+    if not listeners: return
+    data = get_weight_data(lane)
+    for cb in listeners:
+        cb(lane, data)
+
+def _watch():
+    # Shared-memory mode: the daemon writes; this worker only spots new samples and tells its listeners
+    seen = {lane: -1 for lane in manager.lanes}
+    down = False
+    while True:
+        for lane, lane_state in manager.lanes.items():
+            seq = lane_state.seq
+            if seq != seen[lane] and seq % 2 == 0:
+                seen[lane] = seq
+                _notify(lane)
+        if (shared.age() > 2) != down:
+            down = not down
+            print("⚠️ Scale reader stopped publishing" if down else "✅ Scale reader publishing again")
+        time.sleep(SAMPLE_INTERVAL / 2)
+
+def get_lane(lane=None):
+    # KeyError for lanes this backend doesn't serve
+    return manager.lanes[lane or manager.default_lane]
+
+def get_weight_data(lane=None):
+    weight, is_stable = get_lane(lane).reading
+    return {"weight": weight, "is_stable": is_stable}
+
+def get_history(seconds=10, lane=None):
+    t, w = get_lane(lane).samples.snapshot(int(seconds / SAMPLE_INTERVAL))
+    median, std = moving_stats(w)
+    pad = len(w) - len(median) # The first window-1 samples have no full window yet
+    return {
+        "window": STABLE_WINDOW, "stable_std": STABLE_STD,
+        "t": t.round(3).tolist(), "raw": w.round(3).tolist(),
+        "median": [None] * pad + median.round(3).tolist(), "std": [None] * pad + std.round(4).tolist(),
+        "stable": [None] * pad + (std <= STABLE_STD).tolist(),
+    }
+
+def start():
+    # API process: poll the devices in a thread here, or with SCALE_SHM, follow the scale_reader daemon
+    global manager, state, shared
+    if SHM_NAME:
+        shared = scale_shm.attach(SHM_NAME)
+        manager = DeviceManager([{"lane": lane} for lane in shared.lanes], shared.records, devices=False)
+        target, name = _watch, "scale-watch"
+        metrics.scale_jitter.share(shared.jitter) # The reader's loop, not ours
+        metrics.register(metrics.Gauge("scale_reader_heartbeat_age_seconds", "Since the scale_reader last published", shared.age))
+        print(f"✅ Scale: following scale_reader via shared memory '{SHM_NAME}'")
+    else:
+        manager = DeviceManager(load_config())
+        target, name = manager.run, "scale-reader"
+    state = manager.lanes[manager.default_lane]
+    threading.Thread(target=target, name=name, daemon=True).start() # Named for profiles
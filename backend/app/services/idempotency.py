@@ -0,0 +1,62 @@
+# Recent checkout keys -> their response, so a fast retry is answered without another DB write or journal line.
+# A retry that lands while the original is still in flight waits for the original's answer.
+import asyncio
+import os
+import threading
+from concurrent.futures import Future
+from .ttl_cache import TTLCache
+
+TTL = float(os.getenv("IDEMPOTENCY_TTL", "600")) # s; past this, the unique index still catches replays
+SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "4096"))
+
+class IdempotencyCache:
+    def __init__(self):
+        self.cache = TTLCache(SIZE, TTL)
+        self._lock = threading.Lock()
+
+    def _claim(self, key):
+        # -> (future, owner); the owner does the work, everyone else waits on its future
+        with self._lock:
+            fut = self.cache.get(key)
+            if fut is not None:
+                return fut, False
+            fut = Future()
+            self.cache.put(key, fut)
+            return fut, True
+
+    def _fail(self, key, fut, e):
+        self.cache.pop(key) # Let the next retry try again
+        fut.set_exception(e)
+
+    def run(self, key, fn):
+        if not key:
+            return fn()
+        fut, owner = self._claim(key)
+        if not owner:
+            return fut.result()
+        try:
+            result = fn()
+        except BaseException as e:
+            self._fail(key, fut, e)
+            raise
+        fut.set_result(result)
+        return result
+
+    async def arun(self, key, fn):
+        if not key:
+            return await fn()
+        fut, owner = self._claim(key)
+        if not owner:
+            return await asyncio.wrap_future(fut)
+        try:
+            result = await fn()
+        except BaseException as e: # Incl. cancellation, or waiters would hang
+            self._fail(key, fut, e)
+            raise
+        fut.set_result(result)
+        return result
+
+    def stats(self):
+        return self.cache.stats()
+
+cache = IdempotencyCache()
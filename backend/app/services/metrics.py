@@ -0,0 +1,163 @@
+# In-process metrics rendered in the Prometheus text format at /metrics: per-route latency, SQL statements
+# and time per request (SQLAlchemy cursor events), scale loop jitter and inference timing.
+# Every worker process keeps its own numbers; Prometheus scrapes and sums them.
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "500")) # 0 disables the slow-request log
+SLOW_LOG_STATEMENTS = 20 # statements kept per request for the slow log
+
+SECONDS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+JITTER = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, 1)
+COUNTS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+def _labels(names, values):
+    if not names: return ""
+    return "{" + ",".join(f'{n}="{v}"' for n, v in zip(names, values)) + "}"
+
+def _num(v):
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+class Histogram:
+    def __init__(self, name, help, buckets, labels=()):
+        self.name, self.help, self.buckets, self.labels = name, help, buckets, labels
+        self.series = {}
+        self._lock = threading.Lock()
+
+    def share(self, store):
+        # Keep an unlabelled histogram in a float64 array of len(buckets) + 2 (bucket counts, sum, count),
+        # e.g. in shared memory so another process renders what this one observes. One writer only.
+        self.series = {(): store}
+
+    def observe(self, value, *labels):
+        with self._lock:
+            s = self.series.get(labels)
+            if s is None:
+                s = self.series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            i = bisect_left(self.buckets, value)
+            if i < len(self.buckets): s[i] += 1
+            s[-2] += value
+            s[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(k, list(v)) for k, v in sorted(self.series.items())]
+        for values, s in series:
+            cumulative = 0
+            for bound, n in zip(self.buckets, s):
+                cumulative += int(n)
+                lines.append(f"{self.name}_bucket{_labels(self.labels + ('le',), values + (bound,))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels(self.labels + ('le',), values + ('+Inf',))} {int(s[-1])}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, values)} {_num(float(s[-2]))}")
+            lines.append(f"{self.name}_count{_labels(self.labels, values)} {int(s[-1])}")
+        return lines
+
+class Gauge:
+    # Read when scraped; fn returns a number, or None to leave the sample out
+    def __init__(self, name, help, fn):
+        self.name, self.help, self.fn = name, help, fn
+
+    def render(self):
+        value = self.fn()
+        if value is None: return []
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {_num(value)}"]
+
+registry = []
+
+def register(metric):
+    registry.append(metric)
+    return metric
+
+def render():
+    return "\n".join(line for m in registry for line in m.render()) + "\n"
+
+request_seconds = register(Histogram("http_request_duration_seconds", "Request latency by route template",
+                                     SECONDS, ("method", "route", "status")))
+request_statements = register(Histogram("db_statements_per_request", "SQL statements executed per request", COUNTS, ("route",)))
+request_db_seconds = register(Histogram("db_seconds_per_request", "Time spent in SQL per request", SECONDS, ("route",)))
+statement_seconds = register(Histogram("db_statement_duration_seconds", "SQL statement latency, requests and background work",
+                                       SECONDS))
+inference_batch_seconds = register(Histogram("inference_batch_seconds", "Feature extraction plus model pass per batch", SECONDS))
+inference_batch_size = register(Histogram("inference_batch_size", "Frames per inference batch", (1, 2, 4, 8, 16, 32)))
+inference_wait_seconds = register(Histogram("inference_queue_wait_seconds", "Time a frame waits for its batch", SECONDS))
+scale_jitter = register(Histogram("scale_loop_jitter_seconds", "How far each scale poll lands from its 10 Hz slot", JITTER))
+
+# --- SQL accounting ---
+
+class RequestStats:
+    __slots__ = ("statements", "seconds", "log")
+
+    def __init__(self):
+        self.statements, self.seconds, self.log = 0, 0.0, []
+
+_current = ContextVar("metrics_request", default=None) # Copied into threadpool calls and SQLAlchemy's greenlets
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    statement_seconds.observe(elapsed)
+    stats = _current.get()
+    if stats is None: return
+    stats.statements += 1
+    stats.seconds += elapsed
+    if len(stats.log) < SLOW_LOG_STATEMENTS:
+        stats.log.append((elapsed, statement))
+
+# --- HTTP ---
+
+def _slow_log(method, route, status, elapsed, stats):
+    print(f"⚠️ Slow request: {method} {route} -> {status} in {elapsed * 1000:.0f} ms, "
+          f"{stats.statements} SQL statement(s) taking {stats.seconds * 1000:.0f} ms")
+    for seconds, statement in sorted(stats.log, key=lambda x: -x[0]):
+        print(f"    {seconds * 1000:8.1f} ms  {' '.join(statement.split())[:300]}")
+    if stats.statements > len(stats.log):
+        print(f"    ... {stats.statements - len(stats.log)} more")
+
+def route_template(scope):
+    # "/api/products/{name}/price" rather than the concrete path, so each route is one series. Newer FastAPI
+    # leaves the router-relative template in scope["route"]; the include prefix is taken back off the path.
+    template = getattr(scope.get("route"), "path_format", None)
+    if template is None: return "unmatched"
+    return scope["path"].rsplit("/", template.count("/"))[0] + template
+
+class MetricsMiddleware:
+    # Plain ASGI rather than BaseHTTPMiddleware: no extra task per request, and streaming bodies pass through untouched
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        stats = RequestStats()
+        token = _current.set(stats)
+        response = {"status": 500, "stream": False}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["stream"] = any(k == b"content-type" and v.startswith(b"text/event-stream") for k, v in message.get("headers", ()))
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _current.reset(token)
+            route = route_template(scope)
+            method, status = scope["method"], response["status"]
+            request_seconds.observe(elapsed, method, route, str(status))
+            request_statements.observe(stats.statements, route)
+            request_db_seconds.observe(stats.seconds, route)
+            if SLOW_REQUEST_MS and elapsed * 1000 >= SLOW_REQUEST_MS and not response["stream"]:
+                _slow_log(method, route, status, elapsed, stats)
@@ -0,0 +1,125 @@
+# bcrypt on its own small process pool, so a login rush can't starve the request threadpool
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from passlib.context import CryptContext
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12")) # Existing hashes of any cost still verify
+WORKERS = int(os.getenv("PASSWORD_WORKERS", "2"))
+MAX_PENDING = int(os.getenv("PASSWORD_MAX_PENDING", "64")) # Beyond this, fail fast with 503
+NICE = int(os.getenv("PASSWORD_NICE", "10")) # Workers yield the CPU to request handling
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+# --- Run inside the worker processes ---
+def _init_worker():
+    if hasattr(os, "nice"): os.nice(NICE)
+
+def _hash(password):
+    start = time.time()
+    return pwd_context.hash(password), start, time.time()
+
+def _verify(password, hashed):
+    start = time.time()
+    return pwd_context.verify(password, hashed), start, time.time()
+
+def _ping():
+    return os.getpid()
+
+class PoolBusy(Exception):
+    pass
+
+class PasswordPool:
+    def __init__(self, workers=WORKERS, max_pending=MAX_PENDING):
+        self.workers, self.max_pending = workers, max_pending
+        self._executor = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.peak_pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timings = deque(maxlen=512) # (queue wait, run) in ms
+
+    def _pool(self):
+        if self._executor is None:
+            # spawn: never fork a process that owns the scale reader and DB threads
+            self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                                 initializer=_init_worker)
+        return self._executor
+
+    def _discard(self, pool):
+        # A worker died (OOM, kill): the executor is broken for good, so the next call builds a new one
+        with self._lock:
+            if self._executor is pool:
+                self._executor = None
+        pool.shutdown(wait=False, cancel_futures=True)
+        print("⚠️ Password pool worker died: restarting the pool")
+
+    def warm(self):
+        # Spawn the workers at startup rather than on the first login
+        with self._lock:
+            pool = self._pool()
+        try:
+            for f in [pool.submit(_ping) for _ in range(self.workers)]:
+                f.result()
+        except BrokenProcessPool: # Startup retries on a fresh pool
+            self._discard(pool)
+            raise
+
+    async def _run(self, fn, *args):
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise PoolBusy()
+            self.pending += 1
+            self.peak_pending = max(self.peak_pending, self.pending)
+            pool = self._pool()
+        submitted = time.time()
+        try:
+            try:
+                result, started, finished = await asyncio.wrap_future(pool.submit(fn, *args))
+            except BrokenProcessPool:
+                self._discard(pool)
+                with self._lock:
+                    pool = self._pool()
+                try: # Once, on a fresh pool: hashing and verifying are safe to repeat
+                    result, started, finished = await asyncio.wrap_future(pool.submit(fn, *args))
+                except BrokenProcessPool:
+                    self._discard(pool)
+                    raise PoolBusy()
+        finally:
+            with self._lock:
+                self.pending -= 1
+        with self._lock:
+            self.completed += 1
+            self.timings.append(((started - submitted) * 1000, (finished - started) * 1000))
+        return result
+
+    async def hash(self, password):
+        return await self._run(_hash, password)
+
+    async def verify(self, password, hashed):
+        return await self._run(_verify, password, hashed)
+
+    def stats(self):
+        with self._lock:
+            waits = sorted(t[0] for t in self.timings)
+            runs = sorted(t[1] for t in self.timings)
+        pct = lambda xs, p: round(xs[min(len(xs) - 1, int(len(xs) * p / 100))], 1) if xs else None
+        return {
+            "workers": self.workers, "bcrypt_rounds": BCRYPT_ROUNDS, "max_pending": self.max_pending,
+            "pending": self.pending, "peak_pending": self.peak_pending, "completed": self.completed,
+            "rejected": self.rejected, "wait_p50_ms": pct(waits, 50), "wait_p95_ms": pct(waits, 95),
+            "run_p50_ms": pct(runs, 50),
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+pool = PasswordPool()
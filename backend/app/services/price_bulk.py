@@ -0,0 +1,119 @@
+# Bulk price import / export: a whole price list in one transaction, one UPDATE ... FROM (VALUES ...) per
+# CHUNK rows, and a single catalog invalidation however many products changed
+import csv
+import io
+import json
+import math
+from sqlalchemy import select, text
+from ..database import SessionLocal, Product
+from . import price_catalog, price_history
+
+CHUNK = 1000 # rows per statement, well under SQLite's and Postgres' bind-parameter limits
+MAX_ROWS = 100_000
+MAX_JSON_BYTES = MAX_ROWS * 256 # A JSON body is parsed whole: cap what gets buffered for it
+
+async def _lines(chunks):
+    buf = b""
+    async for chunk in chunks:
+        *lines, buf = (buf + chunk).split(b"\n")
+        for line in lines:
+            yield line
+    if buf:
+        yield buf
+
+async def _aenumerate(it):
+    n = 0
+    async for x in it:
+        n += 1
+        yield n, x
+
+def _price(name, value, where):
+    try:
+        price = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{where}: bad price {value!r}")
+    if not name or not math.isfinite(price) or price < 0:
+        raise ValueError(f"{where}: bad row")
+    return price
+
+async def read_prices(chunks, content_type):
+    # -> {name: price}; the last row for a name wins. text/csv (name,price header), application/x-ndjson
+    # and application/json ({"name": price} or [{"name", "price"}]); ValueError for anything malformed
+    prices = {}
+    rows = 0
+    if "json" in content_type and "ndjson" not in content_type:
+        body = bytearray()
+        async for chunk in chunks:
+            body += chunk
+            if len(body) > MAX_JSON_BYTES:
+                raise ValueError(f"JSON body over {MAX_JSON_BYTES} bytes: send CSV or NDJSON")
+        data = json.loads(bytes(body) or b"[]")
+        if not isinstance(data, (dict, list)):
+            raise ValueError("Expected a JSON object or array")
+        if len(data) > MAX_ROWS:
+            raise ValueError(f"More than {MAX_ROWS} rows")
+        rows = data.items() if isinstance(data, dict) else ((r.get("name"), r.get("price")) if isinstance(r, dict) else (None, None) for r in data)
+        for n, (name, value) in enumerate(rows, 1):
+            prices[name] = _price(name, value, f"item {n}")
+    else:
+        header = None
+        async for n, line in _aenumerate(_lines(chunks)):
+            line = line.decode("utf-8-sig").strip()
+            if not line: continue
+            if "ndjson" in content_type:
+                row = json.loads(line)
+                if not isinstance(row, dict): raise ValueError(f"line {n}: expected an object")
+                name, value = row.get("name"), row.get("price")
+            else:
+                fields = next(csv.reader([line]))
+                if header is None:
+                    header = [f.strip().lower() for f in fields]
+                    if "name" not in header or "price" not in header:
+                        raise ValueError("CSV needs a header with name and price columns")
+                    continue
+                row = dict(zip(header, fields))
+                name, value = row.get("name", "").strip(), row.get("price")
+            rows += 1
+            if rows > MAX_ROWS: # As they stream in, before the rest of the body is read
+                raise ValueError(f"More than {MAX_ROWS} rows")
+            prices[name] = _price(name, value, f"line {n}")
+    return prices
+
+def apply(prices):
+    # -> names that were updated; unknown names are left out, nothing is created
+    db = SessionLocal()
+    try:
+        updated = []
+        items = list(prices.items())
+        for start in range(0, len(items), CHUNK):
+            chunk = items[start:start + CHUNK]
+            values = ", ".join(f"(:n{i}, CAST(:p{i} AS FLOAT))" for i in range(len(chunk)))
+            params = {k: v for i, (name, price) in enumerate(chunk) for k, v in ((f"n{i}", name), (f"p{i}", price))}
+            updated += db.execute(text(
+                f"WITH v(name, price) AS (VALUES {values}) "
+                "UPDATE products SET price = v.price FROM v WHERE products.name = v.name RETURNING products.name"
+            ), params).scalars().all()
+        if updated:
+            price_history.record(db, {name: prices[name] for name in updated})
+            price_catalog.publish_change(db) # Once for the whole list
+        db.commit()
+        return updated
+    finally:
+        db.close()
+
+def export(fmt):
+    # Streams the catalog in name order; CSV output can be fed straight back to the import
+    db = SessionLocal()
+    try:
+        rows = db.execute(select(Product.name, Product.price).order_by(Product.name).execution_options(yield_per=500))
+        if fmt == "csv":
+            yield "name,price\n"
+            for name, price in rows:
+                buf = io.StringIO()
+                csv.writer(buf, lineterminator="\n").writerow([name, price])
+                yield buf.getvalue()
+        else:
+            for name, price in rows:
+                yield json.dumps({"name": name, "price": price}) + "\n"
+    finally:
+        db.close()
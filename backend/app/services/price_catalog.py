@@ -0,0 +1,97 @@
+# In-memory price catalog shared by /api/status (and anything else that needs prices)
+import hashlib
+import json
+import select
+import threading
+import time
+from sqlalchemy import event, text
+from starlette.concurrency import run_in_threadpool
+from ..database import SessionLocal, Product, engine
+
+CHANNEL = "price_catalog"
+
+class PriceCatalog:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reload = threading.Lock() # One query at a time; stale readers queued behind it reuse its result
+        self.current = ({}, None) # (prices, etag), swapped as one object so readers never mix two loads
+        self.version = 0
+        self._generation = 0 # Bumped by every invalidate()
+        self._loaded = -1 # Generation the current prices were read at
+
+    @property
+    def _stale(self):
+        return self._loaded != self._generation
+
+    def load(self):
+        with self._reload:
+            generation = self._generation # Before the SELECT: an invalidate() during it leaves us stale
+            if generation == self._loaded:
+                return # Reloaded while we waited for the lock
+            db = SessionLocal()
+            try:
+                prices = {name: price for name, price in db.query(Product.name, Product.price).all()}
+            finally:
+                db.close()
+            # Content hash, so every worker hands out the same ETag for the same catalog
+            digest = hashlib.sha1(json.dumps(prices, sort_keys=True).encode()).hexdigest()[:16]
+            with self._lock:
+                self.current = (prices, f'"{digest}"')
+                self.version += 1
+                self._loaded = generation
+
+    @property
+    def prices(self):
+        return self.current[0]
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+
+    def snapshot(self):
+        if self._stale:
+            self.load()
+        return self.current
+
+    async def asnapshot(self):
+        # Reloads are rare, so they keep the sync session and just leave the event loop
+        if self._stale:
+            await run_in_threadpool(self.load)
+        return self.current
+
+catalog = PriceCatalog()
+
+def publish_change(db):
+    # Call inside the write transaction: Postgres delivers NOTIFY on commit only,
+    # and the local copy is dropped once the new prices are visible
+    event.listen(db, "after_commit", lambda session: catalog.invalidate(), once=True)
+    if db.bind.dialect.name == "postgresql":
+        db.execute(text("SELECT pg_notify(:channel, '')"), {"channel": CHANNEL})
+
+def _listen():
+    # Other uvicorn workers invalidate their copy when any worker changes a price
+    while True:
+        raw = None
+        try:
+            raw = engine.raw_connection()
+            conn = raw.dbapi_connection
+            conn.autocommit = True
+            conn.cursor().execute(f"LISTEN {CHANNEL}")
+            catalog.invalidate() # Missed notifications while reconnecting
+            while True:
+                if select.select([conn], [], [], 30) == ([], [], []):
+                    continue
+                conn.poll()
+                if conn.notifies:
+                    conn.notifies.clear()
+                    catalog.invalidate()
+        except Exception as e:
+            print(f"⚠️ Price listener error: {e}")
+            if raw is not None:
+                raw.invalidate()
+            time.sleep(5)
+
+def start():
+    catalog.load()
+    if engine.dialect.name == "postgresql":
+        threading.Thread(target=_listen, name="price-listener", daemon=True).start()
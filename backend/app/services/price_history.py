@@ -0,0 +1,63 @@
+# Catalog price history: every change appends a row with its validity range, so any sale can be matched
+# against the price that was active when it happened
+import os
+from bisect import bisect_right
+from datetime import datetime, timezone
+from sqlalchemy import func, insert, select, update
+from ..database import SessionLocal, ProductPriceHistory as H
+from .price_catalog import catalog
+from .ttl_cache import TTLCache
+
+CHUNK = 1000 # names per IN (...) list
+CACHE_SIZE = int(os.getenv("PRICE_HISTORY_CACHE_SIZE", "512"))
+
+def record(db, changes, at=None):
+    # Call inside the price write's transaction with {name: new price}; unchanged prices add nothing
+    at = at or datetime.utcnow()
+    items = list(changes.items())
+    for start in range(0, len(items), CHUNK):
+        chunk = dict(items[start:start + CHUNK])
+        current = dict(db.execute(select(H.product_name, H.price).where(H.valid_to == None, H.product_name.in_(chunk))).all())
+        changed = {name: price for name, price in chunk.items() if current.get(name) != price}
+        if not changed: continue
+        db.execute(update(H).where(H.valid_to == None, H.product_name.in_(changed)).values(valid_to=at))
+        db.execute(insert(H), [{"product_name": name, "price": price, "valid_from": at} for name, price in changed.items()])
+
+def covers(dialect_name, at):
+    # Join condition "this history row was valid at `at`"; Postgres gets the form its GiST range index serves
+    if dialect_name == "postgresql":
+        return func.tsrange(H.valid_from, H.valid_to).op("@>")(at)
+    return (H.valid_from <= at) & ((H.valid_to == None) | (at < H.valid_to))
+
+class PriceHistory:
+    # name -> (catalog version, valid_from list, rows): one query per product, then lookups are a bisect.
+    # Every price change reloads the catalog, which retires the cached histories with it.
+    def __init__(self):
+        self.cache = TTLCache(CACHE_SIZE, 3600)
+
+    def _load(self, name):
+        db = SessionLocal()
+        try:
+            return db.execute(select(H.valid_from, H.valid_to, H.price).where(H.product_name == name).order_by(H.valid_from)).all()
+        finally:
+            db.close()
+
+    def as_of(self, name, at):
+        if at.tzinfo is not None: # Stored times are naive UTC
+            at = at.astimezone(timezone.utc).replace(tzinfo=None)
+        catalog.snapshot()
+        version = catalog.version
+        entry = self.cache.get(name)
+        if entry is None or entry[0] != version:
+            rows = self._load(name)
+            entry = (version, [r[0] for r in rows], rows)
+            self.cache.put(name, entry)
+        i = bisect_right(entry[1], at) - 1
+        if i < 0:
+            return None
+        valid_from, valid_to, price = entry[2][i]
+        if valid_to is not None and at >= valid_to:
+            return None
+        return {"name": name, "price": price, "valid_from": valid_from, "valid_to": valid_to}
+
+history = PriceHistory()
@@ -0,0 +1,111 @@
+# Server-side cart pricing: catalog prices plus promotions, precomputed into per-hour arrays so a cart is one NumPy pass
+import os
+import threading
+from datetime import datetime
+from zoneinfo import ZoneInfo
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+from ..database import SessionLocal, Promotion
+from .price_catalog import catalog
+
+# Promotion hours and dates are the store's wall clock, not the container's (often UTC); unset = process local time
+STORE_TZ = ZoneInfo(os.environ["STORE_TZ"]) if os.getenv("STORE_TZ") else None
+
+def store_now():
+    return datetime.now(STORE_TZ).replace(tzinfo=None)
+
+class PriceTable:
+    # Built once per catalog version and day; [product, hour] arrays of the best discount that applies
+    def __init__(self, prices, promotions, key):
+        self.key = key
+        self.names = sorted(prices)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.base = np.array([prices[n] for n in self.names], dtype=float)
+        n = len(self.names)
+        self.hour_off = np.zeros((n, 24)) # Unconditional % off
+        # Weight tiers: one slot per distinct min_weight, so a 2 kg line still gets the 1 kg tier next to a 5 kg one
+        self.tier_min = np.array(sorted({p.min_weight for p in promotions if p.min_weight}), dtype=float)
+        self.tier_off = np.zeros((n, 24, len(self.tier_min))) # [product, hour, tier] % off once the line reaches tier_min kg
+        hours = np.arange(24)
+        for p in promotions:
+            if p.product_name is not None and p.product_name not in self.index: continue
+            rows = [self.index[p.product_name]] if p.product_name is not None else list(range(n))
+            if p.start_hour is None and p.end_hour is None:
+                active = np.ones(24, dtype=bool)
+            elif p.start_hour is None or p.end_hour is None:
+                continue # Half a window (saved before PromotionIn checked): never all day
+            else:
+                active = (hours - p.start_hour) % 24 < (p.end_hour - p.start_hour) % 24
+            cells = np.ix_(rows, np.flatnonzero(active))
+            if p.min_weight:
+                tier = self.tier_off[..., np.searchsorted(self.tier_min, p.min_weight)]
+                tier[cells] = np.maximum(tier[cells], p.percent_off)
+            else:
+                self.hour_off[cells] = np.maximum(self.hour_off[cells], p.percent_off)
+
+    def price(self, names, weights, qtys, hour):
+        # -> (unit price per kg, line total, known) arrays; unknown products price at 0
+        idx = np.fromiter((self.index.get(n, -1) for n in names), dtype=np.intp, count=len(names))
+        known = idx >= 0
+        idx = np.where(known, idx, 0)
+        kg = np.asarray(weights, dtype=float) * np.asarray(qtys, dtype=float)
+        tiers = np.where(kg[:, None] >= self.tier_min, self.tier_off[idx, hour], 0).max(axis=1, initial=0)
+        off = np.maximum(self.hour_off[idx, hour], tiers)
+        unit = np.where(known, np.round(self.base[idx] * (1 - off / 100), 2), 0.0)
+        return unit, np.round(unit * kg, 2), known
+
+def _load_promotions(today):
+    db = SessionLocal()
+    try:
+        return db.query(Promotion).filter(
+            (Promotion.valid_from == None) | (Promotion.valid_from <= today),
+            (Promotion.valid_to == None) | (Promotion.valid_to >= today)).all()
+    finally:
+        db.close()
+
+class PricingEngine:
+    def __init__(self):
+        self.table = None
+        self._lock = threading.Lock()
+
+    def _key(self):
+        # Promotion edits go through price_catalog.publish_change, so the catalog version covers them too.
+        # Version read before prices: a reload in between only labels newer prices as older, forcing a rebuild.
+        return catalog.version, store_now().date()
+
+    def _build(self, key):
+        with self._lock:
+            if self.table is None or self.table.key != key:
+                self.table = PriceTable(catalog.prices, _load_promotions(key[1]), key)
+        return self.table
+
+    def current(self):
+        catalog.snapshot() # Reload first if invalidated
+        key = self._key()
+        return self.table if self.table is not None and self.table.key == key else self._build(key)
+
+    async def acurrent(self):
+        await catalog.asnapshot()
+        key = self._key()
+        if self.table is not None and self.table.key == key:
+            return self.table
+        return await run_in_threadpool(self._build, key)
+
+def reprice(table, req, now=None):
+    # Recompute every line of a CheckoutRequest in place; -> indices of the lines the client got wrong.
+    # ValueError (nothing changed) if a line names a product the catalog doesn't have.
+    if not req.items:
+        req.total = 0.0
+        return []
+    now = now or store_now()
+    names, weights, qtys, prices, totals = zip(*((i.name, i.weight, i.qty, i.price, i.total) for i in req.items))
+    unit, total, known = table.price(names, weights, qtys, now.hour)
+    if not known.all():
+        raise ValueError(f"Not in the catalog: {', '.join(sorted({n for n, k in zip(names, known) if not k}))}")
+    wrong = (np.abs(np.asarray(prices) - unit) > 0.005) | (np.abs(np.asarray(totals) - total) > 0.005)
+    for item, u, t in zip(req.items, unit.tolist(), total.tolist()):
+        item.price, item.total = u, t
+    req.total = round(float(total.sum()), 2)
+    return np.flatnonzero(wrong).tolist()
+
+engine = PricingEngine()
@@ -0,0 +1,86 @@
+# On-demand wall-clock stack sampler for a live backend: every thread's Python stack, sampled from a side thread,
+# folded into flamegraph.pl / speedscope "collapsed" lines ("thread;outer;...;inner count").
+# Nothing runs while no profile is active; the middleware then costs one global lookup per request.
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+
+MAX_SECONDS = 120
+MAX_DEPTH = 128
+
+active = None # The running Profile, if any
+_lock = threading.Lock()
+
+class Busy(Exception):
+    pass
+
+def _label(code):
+    path = code.co_filename.replace(os.sep, "/")
+    return f"{'/'.join(path.rsplit('/', 2)[-2:])}:{getattr(code, 'co_qualname', code.co_name)}"
+
+class Profile:
+    # path: only sample while a request under this path prefix is in flight; None samples the whole window
+    def __init__(self, seconds, interval, path=None):
+        self.seconds, self.interval, self.path = seconds, interval, path
+        self.stacks = Counter()
+        self.samples = 0
+        self.inflight = 0
+        self.done = Future() # Resolved when the window closes; async callers wrap it
+
+    def _sample(self, me):
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == me: continue
+            stack = []
+            while frame is not None and len(stack) < MAX_DEPTH:
+                stack.append(_label(frame.f_code))
+                frame = frame.f_back
+            stack.append(names.get(ident, f"thread-{ident}"))
+            self.stacks[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def run(self):
+        global active
+        me = threading.get_ident()
+        deadline = time.monotonic() + self.seconds
+        try:
+            while True:
+                tick = time.monotonic()
+                if tick >= deadline: break
+                if self.path is None or self.inflight:
+                    self._sample(me)
+                time.sleep(max(0, self.interval - (time.monotonic() - tick)))
+        finally:
+            active = None
+            self.done.set_result(self)
+
+    def collapsed(self):
+        return "".join(f"{stack} {n}\n" for stack, n in self.stacks.most_common())
+
+def start(seconds, interval, path=None):
+    # One profile at a time; Busy if another is running
+    global active
+    with _lock:
+        if active is not None:
+            raise Busy()
+        active = Profile(min(seconds, MAX_SECONDS), interval, path)
+    threading.Thread(target=active.run, name="profiler", daemon=True).start()
+    return active
+
+class ProfilerMiddleware:
+    # Counts in-flight requests for a path-scoped profile
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        profile = active
+        if profile is None or profile.path is None or scope["type"] != "http" or not scope["path"].startswith(profile.path):
+            return await self.app(scope, receive, send)
+        profile.inflight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profile.inflight -= 1
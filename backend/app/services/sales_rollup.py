@@ -0,0 +1,73 @@
+# Incremental sales rollup: checkout upserts it in the same DB transaction, the dashboard reads it
+import os
+from collections import defaultdict
+from sqlalchemy import Integer, cast, extract, func, literal, select, insert
+from sqlalchemy.dialects import postgresql, sqlite
+from ..database import SessionLocal, SalesRollup, Transaction, TransactionItem
+
+STORE_ID = os.getenv("STORE_ID", "main")
+ALL_PRODUCTS = ""
+KEY = ["store_id", "day", "hour", "cashier_name", "product_name"]
+
+def rollup_rows(req, ts):
+    key = {"store_id": STORE_ID, "day": ts.date(), "hour": ts.hour, "cashier_name": req.cashier}
+    per_product = defaultdict(lambda: {"sales": 0.0, "kg": 0.0, "items": 0})
+    for item in req.items:
+        agg = per_product[item.name]
+        agg["sales"] += item.total
+        agg["kg"] += item.weight * item.qty
+        agg["items"] += item.qty
+    rows = [{**key, "product_name": ALL_PRODUCTS, "txn_count": 1, "sales": req.total,
+             "kg": sum(a["kg"] for a in per_product.values()), "items": sum(a["items"] for a in per_product.values())}]
+    # Sorted so concurrent checkouts by one cashier lock rows in the same order
+    rows += [{**key, "product_name": name, "txn_count": 1, **agg} for name, agg in sorted(per_product.items())]
+    return rows
+
+def merge(rows):
+    # One row per key: a multi-row ON CONFLICT upsert may not touch the same row twice (batched journal sync)
+    merged = {}
+    for row in rows:
+        k = tuple(row[c] for c in KEY)
+        if k in merged:
+            for col in ("txn_count", "sales", "kg", "items"): merged[k][col] += row[col]
+        else:
+            merged[k] = dict(row)
+    return [merged[k] for k in sorted(merged)]
+
+def upsert(dialect_name, rows):
+    stmt = (postgresql.insert if dialect_name == "postgresql" else sqlite.insert)(SalesRollup).values(rows)
+    return stmt.on_conflict_do_update(index_elements=KEY, set_={
+        col: getattr(SalesRollup, col) + stmt.excluded[col] for col in ("txn_count", "sales", "kg", "items")
+    })
+
+def backfill():
+    # One-off (migration 4): existing deployments get their history rolled up once, then checkout keeps it current
+    db = SessionLocal()
+    try:
+        if db.query(SalesRollup).first() is not None or db.query(Transaction).first() is None:
+            return
+        day = func.date(Transaction.timestamp)
+        hour = cast(extract("hour", Transaction.timestamp), Integer)
+        per_txn = select(
+            TransactionItem.transaction_id, func.sum(TransactionItem.weight * TransactionItem.quantity).label("kg"),
+            func.sum(TransactionItem.quantity).label("items"),
+        ).group_by(TransactionItem.transaction_id).subquery()
+        header = select(
+            literal(STORE_ID), day, hour, Transaction.cashier_name, literal(ALL_PRODUCTS),
+            func.count(Transaction.id), func.coalesce(func.sum(Transaction.total_amount), 0),
+            func.coalesce(func.sum(per_txn.c.kg), 0), func.coalesce(func.sum(per_txn.c["items"]), 0),
+        ).outerjoin(per_txn, per_txn.c.transaction_id == Transaction.id) \
+         .group_by(day, hour, Transaction.cashier_name)
+        lines = select(
+            literal(STORE_ID), day, hour, Transaction.cashier_name, TransactionItem.product_name,
+            func.count(func.distinct(Transaction.id)), func.sum(TransactionItem.total_price),
+            func.sum(TransactionItem.weight * TransactionItem.quantity), func.sum(TransactionItem.quantity),
+        ).join(Transaction, TransactionItem.transaction_id == Transaction.id) \
+         .group_by(day, hour, Transaction.cashier_name, TransactionItem.product_name)
+        cols = KEY + ["txn_count", "sales", "kg", "items"]
+        db.execute(insert(SalesRollup).from_select(cols, header))
+        db.execute(insert(SalesRollup).from_select(cols, lines))
+        db.commit()
+        print("✅ Sales rollup backfilled")
+    finally:
+        db.close()
@@ -0,0 +1,23 @@
+# The one process that touches the scales: polls every lane and publishes into shared memory for the API workers.
+# Run: python -m app.services.scale_reader   (workers then start with SCALE_SHM=<same name>)
+import os
+import signal
+import sys
+from . import hardware, metrics, scale_shm
+
+def main():
+    name = hardware.SHM_NAME or "veggie_scale"
+    config = hardware.load_config()
+    shared = scale_shm.create(name, [str(cfg["lane"]) for cfg in config], hardware.HISTORY_SIZE)
+    hardware.manager = hardware.DeviceManager(config, shared.records)
+    metrics.scale_jitter.share(shared.jitter) # Rendered by the API workers' /metrics
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0)) # Block stays for the workers; a restarted reader picks it up
+    print(f"✅ Scale reader: {len(config)} lane(s) -> shared memory '{name}' (pid {os.getpid()})")
+
+    def step():
+        hardware.manager.poll()
+        shared.beat()
+    hardware.paced(step)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# Shared-memory block written by the scale_reader daemon and mapped by every API worker.
+# Layout: a 4 KB header ([heartbeat, pid, json length] as float64, {"lanes", "history"} JSON at byte 64, the reader's
+# loop-jitter histogram at byte 3072), then one float64 record per lane (see hardware.HardwareState).
+import json
+import os
+import time
+from multiprocessing import shared_memory
+import numpy as np
+from .metrics import JITTER
+
+HEADER = 4096
+META_AT = 64
+JITTER_AT = 3072 # len(JITTER) + 2 float64 (see metrics.Histogram.share)
+STATE_FIELDS = 4 # seq, weight, is_stable, sample count; then the t and w rings
+
+def record_size(history):
+    return STATE_FIELDS + 2 * history
+
+def _open(name, create=False, size=0):
+    # Untracked: the block must outlive reader restarts, and a worker exiting must not unlink it
+    try:
+        return shared_memory.SharedMemory(name, create=create, size=size, track=False) # 3.13+
+    except TypeError:
+        shm = shared_memory.SharedMemory(name, create=create, size=size)
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+class SharedScale:
+    def __init__(self, shm, writable=True):
+        self.shm = shm
+        self.head = np.ndarray(3, np.float64, shm.buf)
+        meta = json.loads(bytes(shm.buf[META_AT:META_AT + int(self.head[2])])) # ValueError until the reader wrote it
+        self.lanes, self.history = meta["lanes"], meta["history"]
+        self.jitter = np.ndarray(len(JITTER) + 2, np.float64, shm.buf, JITTER_AT)
+        size = record_size(self.history)
+        self.records = {lane: np.ndarray(size, np.float64, shm.buf, HEADER + i * size * 8) for i, lane in enumerate(self.lanes)}
+        if not writable: # API workers only read; a stray write would corrupt every other worker's view
+            for a in (self.head, self.jitter, *self.records.values()):
+                a.flags.writeable = False
+
+    def beat(self):
+        self.head[0] = time.time()
+
+    def age(self):
+        return time.time() - self.head[0]
+
+def create(name, lanes, history):
+    # Reader side. An existing block with the same layout is reused, so API workers keep their mapping
+    # across a reader restart; a different layout needs the workers restarted too.
+    try:
+        shared = SharedScale(_open(name))
+        if shared.lanes == lanes and shared.history == history:
+            for rec in shared.records.values():
+                if rec[0] % 2: # The old reader died mid-write: even again, and moved so readers retry
+                    rec[0] += 1
+            shared.head[1] = os.getpid()
+            return shared
+        print(f"⚠️ Scale layout changed: recreating {name}, restart the API workers")
+        shared.shm.unlink()
+    except (FileNotFoundError, ValueError):
+        pass
+    meta = json.dumps({"lanes": lanes, "history": history}).encode()
+    if META_AT + len(meta) > JITTER_AT:
+        raise ValueError(f"Too many lanes for the shared-memory header: {len(lanes)}")
+    try:
+        shm = _open(name, create=True, size=HEADER + len(lanes) * record_size(history) * 8)
+    except FileExistsError: # Half-written block left by a crash
+        shared_memory.SharedMemory(name).unlink()
+        shm = _open(name, create=True, size=HEADER + len(lanes) * record_size(history) * 8)
+    shm.buf[META_AT:META_AT + len(meta)] = meta
+    head = np.ndarray(3, np.float64, shm.buf)
+    head[1], head[2] = os.getpid(), len(meta) # Length last: workers attach only once the JSON is complete
+    return SharedScale(shm)
+
+def attach(name, wait=30):
+    # API worker side: waits for the reader to come up
+    deadline = time.time() + wait
+    while True:
+        try:
+            return SharedScale(_open(name), writable=False)
+        except (FileNotFoundError, ValueError):
+            if time.time() > deadline:
+                raise RuntimeError(f"No scale reader publishing to shared memory '{name}' (python -m app.services.scale_reader)")
+            time.sleep(0.5)
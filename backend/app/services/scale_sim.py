@@ -0,0 +1,68 @@
+# Scale devices without hardware: seeded simulation profiles, and replay of recorded HX711 traces
+import csv
+import os
+import random
+import threading
+import time
+
+# Raw platform readings: 0.5 kg is the empty platform (auto-tared away), targets are what lands on it
+PROFILES = {
+    "default": {"change_prob": 0.05, "targets": [0.5, 1.5, 3.0, 0.0], "approach": 0.1, "noise": 0.02},
+    "rush_hour": {"change_prob": 0.15, "targets": [0.5, 0.8, 1.2, 2.0, 0.5], "approach": 0.25, "noise": 0.01},
+    "shaky_counter": {"change_prob": 0.03, "targets": [0.5, 1.0, 1.5], "approach": 0.1, "noise": 0.06},
+    "heavy_pumpkins": {"change_prob": 0.04, "targets": [0.5, 3.5, 5.0, 8.0], "approach": 0.05, "noise": 0.03},
+}
+
+class SimulatedScale:
+    # Deterministic for a given seed; no seed keeps the old free-running behaviour
+    def __init__(self, cfg):
+        self.profile = PROFILES[cfg.get("profile", "default")]
+        self.rng = random.Random(cfg.get("seed"))
+        self.tare = 0.5 # Auto Tare
+        self.raw = 0.5
+        self.target = 0.5
+
+    def ready(self):
+        return True
+
+    def read(self):
+        p, rng = self.profile, self.rng
+        if rng.random() < p["change_prob"]: self.target = rng.choice(p["targets"])
+        diff = (self.target - self.raw) * p["approach"]
+        self.raw += diff + rng.uniform(-p["noise"], p["noise"])
+        return max(0, round(self.raw - self.tare, 2))
+
+def load_trace(path, lane=None):
+    # CSV written by TraceRecorder: t,lane,weight
+    with open(path, newline="") as f:
+        return [float(row["weight"]) for row in csv.DictReader(f) if lane is None or row["lane"] == str(lane)]
+
+class ReplayScale:
+    # Plays a recorded trace back one sample per read, looping at the end
+    def __init__(self, cfg):
+        self.samples = load_trace(cfg["trace"], cfg.get("trace_lane"))
+        if not self.samples:
+            raise ValueError(f"No samples in {cfg['trace']}")
+        self.pos = 0
+
+    def ready(self):
+        return True
+
+    def read(self):
+        val = self.samples[self.pos]
+        self.pos = (self.pos + 1) % len(self.samples)
+        return val
+
+class TraceRecorder:
+    # Appends every device reading to a CSV trace (SCALE_RECORD=path) for later replay
+    def __init__(self, path):
+        new = not os.path.exists(path)
+        self.f = open(path, "a", newline="")
+        self.writer = csv.writer(self.f)
+        self._lock = threading.Lock()
+        if new: self.writer.writerow(["t", "lane", "weight"])
+
+    def record(self, lane, weight):
+        with self._lock:
+            self.writer.writerow([f"{time.time():.3f}", lane, weight])
+            self.f.flush()
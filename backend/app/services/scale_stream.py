@@ -0,0 +1,51 @@
+# Push scale readings to every connected terminal from one broadcaster
+import asyncio
+import os
+from . import hardware
+
+PUSH_DELTA = float(os.getenv("SCALE_PUSH_DELTA", "0.01")) # kg
+
+class ScaleBroadcaster:
+    def __init__(self, delta=PUSH_DELTA):
+        self.delta = delta
+        self.last = {} # lane -> last pushed reading
+        self.subscribers = {} # lane -> set of queues
+        self._loop = None
+
+    def _start(self):
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+            hardware.subscribe(self._on_sample)
+
+    def changed(self, last, data):
+        return last is None or last["is_stable"] != data["is_stable"] or abs(last["weight"] - data["weight"]) >= self.delta
+
+    def _on_sample(self, lane, data):
+        # Runs on the reader thread: only filter here, fan-out happens on the event loop
+        if not self.changed(self.last.get(lane), data):
+            return
+        self.last[lane] = data
+        try:
+            self._loop.call_soon_threadsafe(self._publish, lane, data)
+        except RuntimeError:
+            pass # Loop closed (shutdown / reload)
+
+    def _publish(self, lane, data):
+        for q in self.subscribers.get(lane, ()):
+            if q.full(): # Slow client: drop the stale reading, keep the newest
+                q.get_nowait()
+            q.put_nowait(data)
+
+    def subscribe(self, lane):
+        # KeyError for an unknown lane
+        data = hardware.get_weight_data(lane)
+        self._start()
+        q = asyncio.Queue(maxsize=1)
+        q.put_nowait(data)
+        self.subscribers.setdefault(lane, set()).add(q)
+        return q
+
+    def unsubscribe(self, lane, q):
+        self.subscribers.get(lane, set()).discard(q)
+
+broadcaster = ScaleBroadcaster()
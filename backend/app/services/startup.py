@@ -0,0 +1,122 @@
+# Startup as named subsystems, initialized concurrently in the background from the FastAPI lifespan.
+# The port opens as soon as the app is imported; /ready reports each subsystem, and a request waits (up to
+# STARTUP_WAIT) only for the subsystems its routes need instead of racing them. A subsystem that fails
+# (DB not up yet, scale reader late) retries with backoff rather than taking the app down with it.
+import asyncio
+import os
+import time
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+
+STARTUP_WAIT = float(os.getenv("STARTUP_WAIT", "30")) # seconds a request waits for its subsystems before a 503
+RETRY_MAX = float(os.getenv("STARTUP_RETRY_MAX", "60")) # s; failed subsystems retry with backoff up to this
+
+class Subsystem:
+    def __init__(self, name, fn, after=(), required=True):
+        self.name, self.fn, self.after, self.required = name, fn, after, required
+        self.status = "pending" # -> starting -> ready | failed (and retrying)
+        self.seconds = None
+        self.error = None
+        self.attempts = 0
+        self.task = None
+        self.tried = None # Set once the first attempt is over, however it went
+        self.up = None # Set once ready
+
+    def _fail(self, error):
+        self.status, self.error = "failed", error
+        self.tried.set()
+
+    async def run(self):
+        for name in self.after:
+            dep = subsystems[name]
+            await dep.tried.wait()
+            if dep.status != "ready":
+                self._fail(f"needs {name}") # Answered as such meanwhile, and started once it is up
+                await dep.up.wait()
+        delay = 1
+        while True:
+            self.status, self.attempts = "starting", self.attempts + 1
+            start = time.perf_counter()
+            try:
+                if asyncio.iscoroutinefunction(self.fn):
+                    await self.fn()
+                else:
+                    await run_in_threadpool(self.fn) # Blocking I/O (DB, files, devices) stays off the event loop
+                self.status, self.error = "ready", None
+                self.seconds = round(time.perf_counter() - start, 3)
+                self.up.set()
+                self.tried.set()
+                _settle()
+                return
+            except Exception as e:
+                self.seconds = round(time.perf_counter() - start, 3)
+                self._fail(f"{type(e).__name__}: {e}")
+                print(f"⚠️ Startup: {self.name} failed: {self.error} (retrying in {delay:g}s)")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RETRY_MAX)
+
+subsystems = {}
+ready = False
+_started = None
+_required = None
+
+def add(name, fn, after=(), required=True):
+    # required=False: warm-ups that only make the first requests faster; /ready and requests don't wait for them
+    subsystems[name] = Subsystem(name, fn, after, required)
+
+def _settle():
+    global ready
+    if not ready and all(s.status == "ready" for s in subsystems.values() if s.required):
+        ready = True
+        print(f"✅ Ready in {time.perf_counter() - _started:.2f}s")
+
+async def _finish(required):
+    await asyncio.gather(*(s.tried.wait() for s in required))
+    if not ready:
+        print(f"⚠️ Started without: {', '.join(s.name for s in required if s.status != 'ready')} (retrying)")
+
+def begin():
+    # From the lifespan: everything starts at once, each subsystem waiting only on its own `after`
+    global _started, _required
+    _started = time.perf_counter()
+    for s in subsystems.values():
+        s.tried, s.up = asyncio.Event(), asyncio.Event()
+    for s in subsystems.values():
+        s.task = asyncio.create_task(s.run())
+    _required = asyncio.create_task(_finish([s for s in subsystems.values() if s.required]))
+
+def stop():
+    # From the lifespan on shutdown: subsystems still retrying
+    for s in subsystems.values():
+        if s.task is not None: s.task.cancel()
+    if _required is not None: _required.cancel()
+
+def requires(*names):
+    # Route dependency: free once started, otherwise holds the request until the subsystems it needs have had
+    # their first try; a failed one answers 503 right away while it retries in the background
+    async def wait():
+        if ready: return
+        needed = [subsystems[n] for n in names]
+        if all(s.status == "ready" for s in needed): return
+        if any(s.task is None for s in needed):
+            raise HTTPException(status_code=503, detail="Not started", headers={"Retry-After": "5"})
+        try:
+            await asyncio.wait_for(asyncio.gather(*(s.tried.wait() for s in needed)), STARTUP_WAIT)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=503, detail="Still starting", headers={"Retry-After": "5"})
+        failed = [s.name for s in needed if s.status != "ready"]
+        if failed:
+            raise HTTPException(status_code=503, detail=f"Unavailable: {', '.join(failed)} (see /ready)", headers={"Retry-After": "30"})
+    return wait
+
+async def wait_ready():
+    # Every required subsystem, through any retries; for scripts that run the app in-process
+    await asyncio.gather(*(s.up.wait() for s in subsystems.values() if s.required))
+
+def report():
+    return {
+        "ready": ready,
+        "subsystems": {s.name: {"status": s.status, "required": s.required, "seconds": s.seconds, "error": s.error,
+                            "attempts": s.attempts}
+                       for s in subsystems.values()},
+    }
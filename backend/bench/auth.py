@@ -0,0 +1,60 @@
+# Per-request cost of the auth dependency: cold (decode + user query), warm token, fully cached
+# Usage: DATABASE_URL=... python -m bench.auth --iterations 5000
+import argparse
+import asyncio
+import json
+import time
+from jose import jwt
+from app.database import init_db, SessionLocal, User
+from app.routers.auth import get_current_user, issue_token, SECRET_KEY, ALGORITHM
+from app.services import auth_cache
+from app.services.password_pool import pwd_context
+
+def bearer():
+    db = SessionLocal()
+    try:
+        u = db.query(User).filter(User.username == "bench").first()
+        if not u:
+            u = User(username="bench", hashed_password=pwd_context.hash("bench"))
+            db.add(u)
+            db.commit()
+        return "Bearer " + issue_token(u)
+    finally:
+        db.close()
+
+def timed(n, fn):
+    t = time.perf_counter()
+    for _ in range(n): fn()
+    return round((time.perf_counter() - t) / n * 1e6, 1) # us per call
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--iterations", type=int, default=5000)
+    args = ap.parse_args()
+    init_db()
+    header = bearer()
+    token = header.split(" ", 1)[1]
+    loop = asyncio.new_event_loop()
+    check = lambda: loop.run_until_complete(get_current_user(header))
+
+    def cold():
+        auth_cache.claims.clear(); auth_cache.users.clear()
+        check()
+
+    def warm_token():
+        auth_cache.users.clear()
+        check()
+
+    n = args.iterations
+    check()
+    print(json.dumps({
+        "iterations": n,
+        "jwt_decode_us": timed(n, lambda: jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])),
+        "cold_us": timed(max(1, n // 10), cold),
+        "user_miss_us": timed(max(1, n // 10), warm_token),
+        "cached_us": timed(n, check),
+        "loop_overhead_us": timed(n, lambda: loop.run_until_complete(asyncio.sleep(0))),
+    }))
+
+if __name__ == "__main__":
+    main()
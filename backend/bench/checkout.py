@@ -0,0 +1,65 @@
+# Checkout write-path benchmark: concurrent checkouts straight through pos.checkout
+# Usage: DATABASE_URL=... python -m bench.checkout --requests 2000 --concurrency 8 --items 10
+#        --journal path: time the acknowledged path instead (fsync'd journal append; the DB syncs behind it)
+import argparse
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app.database import init_db, SessionLocal
+from app.routers.pos import checkout, sync_journal, CheckoutRequest, CartItem
+from app.services.checkout_journal import CheckoutJournal
+
+def make_cart(n_items):
+    items = [CartItem(name=random.choice(["Carrot", "Tomato", "Corn"]), weight=round(random.uniform(0.1, 3), 2),
+                      price=25.0, qty=1, total=0) for _ in range(n_items)]
+    for i in items: i.total = round(i.weight * i.price, 2)
+    return CheckoutRequest(items=items, total=sum(i.total for i in items), cashier="bench")
+
+def one(n_items):
+    req = make_cart(n_items)
+    db = SessionLocal()
+    try:
+        t = time.perf_counter()
+        checkout(req, db)
+        return (time.perf_counter() - t) * 1000
+    finally:
+        db.close()
+
+def one_journaled(journal, n_items):
+    sale = make_cart(n_items).model_dump()
+    t = time.perf_counter()
+    journal.submit(sale)[1].result()
+    return (time.perf_counter() - t) * 1000
+
+def percentile(sorted_ms, p):
+    return sorted_ms[min(len(sorted_ms) - 1, int(len(sorted_ms) * p / 100))]
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=2000)
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--items", type=int, default=10)
+    ap.add_argument("--journal", help="journal file to benchmark against")
+    args = ap.parse_args()
+    init_db()
+    run = one
+    if args.journal:
+        journal = CheckoutJournal(args.journal, sync_journal)
+        run = lambda n: one_journaled(journal, n)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        ms = sorted(pool.map(run, [args.items] * args.requests))
+    elapsed = time.perf_counter() - start
+    extra = {}
+    if args.journal:
+        while journal.size > journal.synced: time.sleep(0.05)
+        extra = {"avg_fsync_group": journal.stats()["avg_group"], "drained_s": round(time.perf_counter() - start, 2)}
+    print(json.dumps({
+        "mode": "journal" if args.journal else "direct", "requests": args.requests, "concurrency": args.concurrency, "items": args.items,
+        "p50_ms": round(percentile(ms, 50), 2), "p95_ms": round(percentile(ms, 95), 2),
+        "p99_ms": round(percentile(ms, 99), 2), "throughput_rps": round(args.requests / elapsed, 1), **extra,
+    }))
+
+if __name__ == "__main__":
+    main()
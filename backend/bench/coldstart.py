@@ -0,0 +1,80 @@
+# Cold start: launch uvicorn, time until it answers "/" (live), until /ready says 200, until the warm-ups are done
+# too (settled), and the first login after that
+# Usage: DATABASE_URL=sqlite:///cold.db python -m bench.coldstart --runs 5
+# Servers without /ready count "/" as ready (everything used to load before the port opened).
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+CREDS = json.dumps({"username": "coldstart", "password": "coldstart"}).encode()
+
+def percentile(sorted_ms, p):
+    return sorted_ms[min(len(sorted_ms) - 1, int(len(sorted_ms) * p / 100))]
+
+def get(url, data=None):
+    # -> (status, body); status None while nothing listens
+    req = urllib.request.Request(url, data, {"Content-Type": "application/json"} if data else {})
+    try:
+        with urllib.request.urlopen(req, timeout=30) as r:
+            return r.status, r.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+    except OSError:
+        return None, None
+
+def settled(status, body):
+    if status == 404: return True
+    return status == 200 and all(s["status"] in ("ready", "failed") for s in json.loads(body)["subsystems"].values())
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def until(url, ok, t0, timeout=120):
+    while time.perf_counter() - t0 < timeout:
+        status, body = get(url)
+        if status is not None and ok(status, body):
+            return status, (time.perf_counter() - t0) * 1000
+        time.sleep(0.01)
+    raise TimeoutError(url)
+
+def run_once(port):
+    base = f"http://127.0.0.1:{port}"
+    t0 = time.perf_counter()
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=os.environ)
+    try:
+        _, live = until(base + "/", lambda s, _: s == 200, t0)
+        status, ready = until(base + "/ready", lambda s, _: s != 503, t0)
+        _, warm = until(base + "/ready", settled, t0)
+        if status == 404: ready = warm = live
+        get(base + "/auth/register", CREDS) # No-op after the first run
+        t = time.perf_counter()
+        get(base + "/auth/token", CREDS)
+        return live, ready, warm, (time.perf_counter() - t) * 1000
+    finally:
+        server.terminate()
+        server.wait()
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5)
+    args = ap.parse_args()
+    run_once(free_port()) # Schema, seed and the bench user exist from here on: later runs are restarts
+    results = [run_once(free_port()) for _ in range(args.runs)]
+    live, ready, warm, login = (sorted(x) for x in zip(*results))
+    print(json.dumps({
+        "runs": args.runs, "live_p50_ms": round(percentile(live, 50)), "ready_p50_ms": round(percentile(ready, 50)),
+        "settled_p50_ms": round(percentile(warm, 50)), "first_login_p50_ms": round(percentile(login, 50)),
+        "ready_max_ms": round(ready[-1]),
+    }))
+
+if __name__ == "__main__":
+    main()
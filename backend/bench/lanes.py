@@ -0,0 +1,164 @@
+# Multi-lane load test: N simulated terminals replaying POS.jsx traffic, swept over lane counts.
+# Each terminal polls /api/status at 1 Hz (with If-None-Match), uploads a raw 160x120 frame to /api/predict
+# after every poll, and checks out a realistic cart every --checkout-every seconds.
+# Usage: DATABASE_URL=sqlite:///load.db python -m bench.lanes --lanes 1,4,8,16 --duration 30     (app in-process)
+#        python -m bench.lanes --url http://127.0.0.1:8000 --lanes 8 --duration 60            (running server)
+# Results go to bench/results/lanes-<commit>.json; --compare an older file to see the p99 deltas.
+# Needs httpx on top of the app: pip install -r bench/requirements.txt
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import subprocess
+import time
+import uuid
+from collections import defaultdict
+import httpx
+import numpy as np
+from bench.checkout import percentile
+
+FRAME_SHAPE = (120, 160, 4)
+
+class Terminal:
+    def __init__(self, n, client, headers, scale_lane, args, samples):
+        self.n, self.client, self.args, self.samples = n, client, args, samples
+        self.headers = {**headers, "X-Terminal-Id": f"bench-{n}"}
+        self.scale_lane = scale_lane
+        self.rng = random.Random(args.seed + n)
+        self.frame = np.random.default_rng(args.seed + n).integers(0, 256, FRAME_SHAPE, dtype=np.uint8)
+        self.etag = None
+        self.prices = {}
+
+    async def call(self, name, method, url, **kw):
+        t = time.perf_counter()
+        try:
+            r = await self.client.request(method, url, **kw)
+            ok = r.status_code < 400
+        except httpx.HTTPError:
+            r, ok = None, False
+        self.samples[name].append(((time.perf_counter() - t) * 1000, ok))
+        return r if ok else None
+
+    def cart(self):
+        names = [n for n in self.prices if n != "Unknown"] or ["Carrot"]
+        items = []
+        for _ in range(self.rng.randint(3, 15)):
+            name, weight, qty = self.rng.choice(names), round(self.rng.uniform(0.1, 3), 2), self.rng.randint(1, 3)
+            price = self.prices.get(name, 0)
+            items.append({"name": name, "weight": weight, "price": price, "qty": qty, "total": weight * price * qty})
+        return {"items": items, "total": sum(i["total"] for i in items), "cashier": f"bench-{self.n}"}
+
+    async def run(self, until):
+        # Staggered start, like terminals that didn't all boot in the same second
+        await asyncio.sleep(self.rng.uniform(0, self.args.interval))
+        next_checkout = time.monotonic() + self.rng.uniform(0, self.args.checkout_every)
+        while time.monotonic() < until:
+            tick = time.monotonic()
+            headers = {**self.headers, **({"If-None-Match": self.etag} if self.etag else {})}
+            r = await self.call("status", "GET", f"/api/status?lane={self.scale_lane}", headers=headers)
+            if r is not None:
+                data = r.json()
+                self.etag = data.get("prices_etag")
+                if data.get("prices"): self.prices = data["prices"]
+            if self.rng.random() < 0.1: # The scene in front of the camera changes now and then
+                self.frame = np.roll(self.frame, self.rng.randint(1, 40), axis=1)
+            await self.call("predict", "POST", f"/api/predict?lane={self.scale_lane}", content=self.frame.tobytes(),
+                            headers={**self.headers, "Content-Type": "application/octet-stream",
+                                     "X-Frame-Shape": ",".join(map(str, FRAME_SHAPE))})
+            if tick >= next_checkout:
+                await self.call("checkout", "POST", "/api/checkout", json=self.cart(),
+                                headers={**self.headers, "Idempotency-Key": uuid.uuid4().hex})
+                next_checkout = tick + self.args.checkout_every * self.rng.uniform(0.5, 1.5)
+            await asyncio.sleep(max(0, self.args.interval - (time.monotonic() - tick)))
+
+async def login(client):
+    creds = {"username": "bench", "password": "bench-load"}
+    await client.post("/auth/register", json=creds)
+    r = await client.post("/auth/token", json=creds)
+    r.raise_for_status()
+    return {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+def summarize(samples, duration):
+    out = {}
+    for name, rows in sorted(samples.items()):
+        ms = sorted(m for m, _ in rows)
+        out[name] = {
+            "requests": len(rows), "errors": sum(1 for _, ok in rows if not ok), "rps": round(len(rows) / duration, 1),
+            "p50_ms": round(percentile(ms, 50), 2), "p95_ms": round(percentile(ms, 95), 2), "p99_ms": round(percentile(ms, 99), 2),
+        }
+    return out
+
+async def sweep(args):
+    async with contextlib.AsyncExitStack() as stack:
+        if args.url:
+            transport, base = None, args.url
+            lanes_available = args.scale_lanes.split(",")
+        else:
+            from app.main import app
+            from app.services import hardware, startup
+            await stack.enter_async_context(app.router.lifespan_context(app)) # ASGITransport doesn't run the lifespan
+            await startup.wait_ready()
+            transport, base = httpx.ASGITransport(app=app), "http://bench"
+            lanes_available = list(hardware.manager.lanes)
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+        client = await stack.enter_async_context(httpx.AsyncClient(transport=transport, base_url=base, timeout=30, limits=limits))
+        headers = await login(client)
+        runs = []
+        for n in args.lanes:
+            samples = defaultdict(list)
+            terminals = [Terminal(i, client, headers, lanes_available[i % len(lanes_available)], args, samples) for i in range(n)]
+            start = time.monotonic()
+            await asyncio.gather(*(t.run(start + args.duration) for t in terminals))
+            elapsed = time.monotonic() - start
+            total = sum(len(v) for v in samples.values())
+            run = {"lanes": n, "duration_s": round(elapsed, 1), "throughput_rps": round(total / elapsed, 1),
+                   "endpoints": summarize(samples, elapsed)}
+            runs.append(run)
+            print(json.dumps(run))
+        return runs
+
+def commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def compare(old_path, runs):
+    with open(old_path) as f:
+        old = {r["lanes"]: r for r in json.load(f)["runs"]}
+    for run in runs:
+        before = old.get(run["lanes"])
+        if not before: continue
+        deltas = {name: f"{e['p99_ms'] - before['endpoints'][name]['p99_ms']:+.1f} ms"
+                  for name, e in run["endpoints"].items() if name in before["endpoints"]}
+        print(json.dumps({"lanes": run["lanes"], "p99_delta": deltas}))
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--lanes", default="1,4,8", type=lambda s: [int(x) for x in s.split(",")], help="lane counts to sweep")
+    ap.add_argument("--duration", type=float, default=30, help="seconds per lane count")
+    ap.add_argument("--interval", type=float, default=1.0, help="status/predict period, as in POS.jsx")
+    ap.add_argument("--checkout-every", type=float, default=30, help="mean seconds between checkouts per lane")
+    ap.add_argument("--url", help="benchmark a running server instead of the app in-process")
+    ap.add_argument("--scale-lanes", default="1", help="with --url: scale lanes the server has")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--out", help="result file (default bench/results/lanes-<commit>.json)")
+    ap.add_argument("--compare", help="earlier result file to diff p99 against")
+    args = ap.parse_args()
+
+    runs = asyncio.run(sweep(args))
+    sha = commit()
+    out = args.out or os.path.join(os.path.dirname(__file__), "results", f"lanes-{sha}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump({"commit": sha, "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "target": args.url or "in-process",
+                   "database": None if args.url else os.getenv("DATABASE_URL"), "duration_s": args.duration,
+                   "interval_s": args.interval, "checkout_every_s": args.checkout_every, "runs": runs}, f, indent=1)
+    print(f"Saved {out}")
+    if args.compare:
+        compare(args.compare, runs)
+
+if __name__ == "__main__":
+    main()
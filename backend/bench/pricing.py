@@ -0,0 +1,50 @@
+# Cart pricing benchmark: the engine's one-pass NumPy pricing vs. pricing line by line in Python
+# Usage: DATABASE_URL=... python -m bench.pricing --lines 50 --iterations 5000
+import argparse
+import json
+import random
+import time
+from app.database import init_db
+from app.services.price_catalog import catalog
+from app.services.pricing import engine, PriceTable, _load_promotions, store_now
+
+def per_line(table, names, weights, qtys, hour):
+    # The straightforward version, for comparison
+    out = []
+    for name, w, q in zip(names, weights, qtys):
+        i = table.index.get(name)
+        if i is None:
+            out.append(0.0)
+            continue
+        kg = w * q
+        tier = max((off for off, least in zip(table.tier_off[i, hour], table.tier_min) if kg >= least), default=0)
+        off = max(table.hour_off[i, hour], tier)
+        out.append(round(round(table.base[i] * (1 - off / 100), 2) * kg, 2))
+    return out
+
+def timed(n, fn):
+    t = time.perf_counter()
+    for _ in range(n): fn()
+    return round((time.perf_counter() - t) / n * 1e6, 1) # us per cart
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--lines", type=int, default=50)
+    ap.add_argument("--iterations", type=int, default=5000)
+    args = ap.parse_args()
+    init_db()
+    table = engine.current()
+    names = [random.choice(table.names) for _ in range(args.lines)]
+    weights = [round(random.uniform(0.1, 3), 3) for _ in range(args.lines)]
+    qtys = [random.randint(1, 3) for _ in range(args.lines)]
+    _, totals, _ = table.price(names, weights, qtys, 12)
+    assert totals.tolist() == per_line(table, names, weights, qtys, 12)
+    print(json.dumps({
+        "lines": args.lines, "products": len(table.names), "iterations": args.iterations,
+        "vectorized_us": timed(args.iterations, lambda: table.price(names, weights, qtys, 12)),
+        "per_line_us": timed(args.iterations, lambda: per_line(table, names, weights, qtys, 12)),
+        "table_build_ms": round(timed(20, lambda: PriceTable(catalog.prices, _load_promotions(store_now().date()), None)) / 1000, 2),
+    }))
+
+if __name__ == "__main__":
+    main()
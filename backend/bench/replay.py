@@ -0,0 +1,102 @@
+# Stress the stability detector, the scale stream filter and checkout together, without hardware.
+# Lanes run a seeded simulation profile or replay a recorded trace, faster than real time.
+# Usage: DATABASE_URL=sqlite:///replay.db python -m bench.replay --profile rush_hour --seed 1 --lanes 8 --minutes 60
+#        python -m bench.replay --trace lane1.csv --speed 10 --no-checkout
+import argparse
+import json
+import time
+from app.services.hardware import HardwareState, SAMPLE_INTERVAL
+from app.services.scale_sim import PROFILES, SimulatedScale, ReplayScale
+from app.services.scale_stream import ScaleBroadcaster
+
+def percentile(sorted_vals, p):
+    return sorted_vals[min(len(sorted_vals) - 1, int(len(sorted_vals) * p / 100))]
+
+class Lane:
+    # A cashier at one scale: adds an item whenever a new load settles, checks out when the scale is cleared
+    def __init__(self, name, device):
+        self.name, self.device = name, device
+        self.state = HardwareState()
+        self.last_pushed = None
+        self.unstable_since = None
+        self.last_added = 0.0
+        self.cart = []
+
+    def step(self, tick, stats, on_checkout):
+        self.state.publish(self.device.read())
+        data = {"weight": self.state.reading[0], "is_stable": self.state.reading[1]}
+        if stats["broadcaster"].changed(self.last_pushed, data):
+            self.last_pushed = data
+            stats["pushes"] += 1
+        weight, stable = self.state.reading
+        if not stable:
+            if self.unstable_since is None: self.unstable_since = tick
+            stats["unstable_samples"] += 1
+            return
+        if self.unstable_since is not None:
+            stats["settle_s"].append((tick - self.unstable_since) * SAMPLE_INTERVAL)
+            self.unstable_since = None
+        if weight > 0.05 and abs(weight - self.last_added) > 0.05:
+            self.cart.append(weight)
+            self.last_added = weight
+        elif weight <= 0.05 and self.cart:
+            on_checkout(self)
+            self.cart, self.last_added = [], 0.0
+
+def make_checkout(stats):
+    from app.database import init_db, SessionLocal
+    from app.routers.pos import checkout, CheckoutRequest, CartItem
+    init_db()
+    def on_checkout(lane):
+        items = [CartItem(name="Tomato", weight=w, price=40.0, qty=1, total=round(w * 40.0, 2)) for w in lane.cart]
+        req = CheckoutRequest(items=items, total=sum(i.total for i in items), cashier=f"lane-{lane.name}")
+        db = SessionLocal()
+        try:
+            t = time.perf_counter()
+            checkout(req, db)
+            stats["checkout_ms"].append((time.perf_counter() - t) * 1000)
+        finally:
+            db.close()
+    return on_checkout
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--profile", default="default", choices=sorted(PROFILES))
+    ap.add_argument("--seed", type=int, default=1, help="lane i uses seed + i")
+    ap.add_argument("--trace", help="replay this recorded CSV trace instead of simulating")
+    ap.add_argument("--lanes", type=int, default=1)
+    ap.add_argument("--minutes", type=float, default=10, help="simulated time")
+    ap.add_argument("--speed", type=float, default=0, help="x real time; 0 = as fast as possible")
+    ap.add_argument("--no-checkout", action="store_true")
+    args = ap.parse_args()
+
+    lanes = [Lane(str(i + 1), ReplayScale({"trace": args.trace}) if args.trace else
+                  SimulatedScale({"profile": args.profile, "seed": args.seed + i})) for i in range(args.lanes)]
+    stats = {"broadcaster": ScaleBroadcaster(), "pushes": 0, "unstable_samples": 0, "settle_s": [], "checkout_ms": []}
+    on_checkout = (lambda lane: stats["checkout_ms"].append(0.0)) if args.no_checkout else make_checkout(stats)
+
+    ticks = int(args.minutes * 60 / SAMPLE_INTERVAL)
+    start = time.perf_counter()
+    for tick in range(ticks):
+        for lane in lanes:
+            lane.step(tick, stats, on_checkout)
+        if args.speed:
+            ahead = (tick + 1) * SAMPLE_INTERVAL / args.speed - (time.perf_counter() - start)
+            if ahead > 0: time.sleep(ahead)
+    elapsed = time.perf_counter() - start
+
+    settle, ms = sorted(stats["settle_s"]), sorted(stats["checkout_ms"])
+    samples = ticks * len(lanes)
+    print(json.dumps({
+        "source": args.trace or f"{args.profile}/seed={args.seed}", "lanes": len(lanes), "samples": samples,
+        "simulated_s": ticks * SAMPLE_INTERVAL, "elapsed_s": round(elapsed, 2),
+        "speedup": round(ticks * SAMPLE_INTERVAL / elapsed, 1),
+        "stable_fraction": round(1 - stats["unstable_samples"] / samples, 3),
+        "settle_p50_s": round(percentile(settle, 50), 2) if settle else None,
+        "settle_p95_s": round(percentile(settle, 95), 2) if settle else None,
+        "stream_pushes": stats["pushes"], "checkouts": len(ms),
+        "checkout_p99_ms": round(percentile(ms, 99), 2) if ms and not args.no_checkout else None,
+    }))
+
+if __name__ == "__main__":
+    main()
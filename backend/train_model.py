@@ -0,0 +1,43 @@
+# Train the produce classifier from dataset/<Class>/*.jpg|png and write model/veggie_clf.npz
+import os, glob, sys
+import numpy as np
+import cv2
+from sklearn.linear_model import LogisticRegression
+from app.services.ai_service import Classifier, decode, extract_features, MODEL_PATH
+
+BASE_DIR = sys.argv[1] if len(sys.argv) > 1 else "dataset"
+
+def augment(img):
+    # A handful of photos per class goes a long way with flips, rotations and lighting changes
+    for flip in (None, 1):
+        base = img if flip is None else cv2.flip(img, flip)
+        for rot in (None, cv2.ROTATE_90_CLOCKWISE, cv2.ROTATE_180, cv2.ROTATE_90_COUNTERCLOCKWISE):
+            r = base if rot is None else cv2.rotate(base, rot)
+            for gain in (0.8, 1.0, 1.2):
+                yield cv2.convertScaleAbs(r, alpha=gain)
+
+def load_dataset():
+    X, y = [], []
+    for cls in sorted(os.listdir(BASE_DIR)):
+        for path in glob.glob(os.path.join(BASE_DIR, cls, "*")):
+            with open(path, "rb") as f:
+                img = decode(f.read()) # Same reduced-resolution decode as /api/predict
+            if img is None:
+                print(f"⚠️ Skipping unreadable image {path}")
+                continue
+            for a in augment(img):
+                X.append(extract_features(a))
+                y.append(cls)
+    return np.array(X), np.array(y)
+
+if __name__ == "__main__":
+    X, y = load_dataset()
+    if len(set(y)) < 2:
+        sys.exit("Need readable images for at least two classes in dataset/")
+    mean, scale = X.mean(axis=0), X.std(axis=0) + 1e-6
+    clf = LogisticRegression(max_iter=2000, C=0.1).fit((X - mean) / scale, y)
+    coef, intercept = clf.coef_, clf.intercept_
+    if len(clf.classes_) == 2: # sklearn keeps a single row for binary problems
+        coef, intercept = np.vstack([-coef, coef]) / 2, np.array([-intercept[0], intercept[0]]) / 2
+    Classifier(clf.classes_, mean.astype(np.float32), scale.astype(np.float32), coef, intercept).save(MODEL_PATH)
+    print(f"Done: {len(X)} samples, classes {list(clf.classes_)} -> {MODEL_PATH}")
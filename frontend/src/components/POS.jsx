@@ -10,18 +10,39 @@ export default function POS({ token, user }) {
   const [qty, setQty] = useState(1);
   const [error, setError] = useState(null);
   const webcamRef = useRef(null);
+  const pricesEtag = useRef(null);
+  const scaleLive = useRef(false);
+  const checkoutKey = useRef(null);
+  const lane = localStorage.getItem('lane') || '1';
+
+  useEffect(() => {
+    // Weight is pushed over the WebSocket; the 1 s poll below only covers prices and AI
+    const ws = new WebSocket(`ws://localhost:8000/ws/scale?lane=${lane}`);
+    ws.onopen = () => { scaleLive.current = true; };
+    ws.onmessage = (e) => setData(prev => ({ ...prev, ...JSON.parse(e.data) }));
+    ws.onclose = () => { scaleLive.current = false; };
+    return () => ws.close();
+  }, []);
 
   useEffect(() => {
     const interval = setInterval(async () => {
       try {
-        const res = await axios.get('http://localhost:8000/api/status', { headers: { Authorization: `Bearer ${token}` } });
-        setData(res.data); setError(null);
+        const headers = { Authorization: `Bearer ${token}` };
+        if (pricesEtag.current) headers['If-None-Match'] = pricesEtag.current;
+        const res = await axios.get(`http://localhost:8000/api/status?lane=${lane}`, { headers });
+        pricesEtag.current = res.data.prices_etag;
+        setData(prev => {
+          const next = { ...res.data, prices: res.data.prices || prev.prices };
+          return scaleLive.current ? { ...next, weight: prev.weight, is_stable: prev.is_stable } : next;
+        });
+        setError(null);
         if (webcamRef.current) {
-            const img = webcamRef.current.getScreenshot();
-            if(img) {
-                const blob = await (await fetch(img)).blob();
-                const fd = new FormData(); fd.append('file', blob, 'img.jpg');
-                const ai = await axios.post('http://localhost:8000/api/predict', fd, { headers: { Authorization: `Bearer ${token}` } });
+            // Send a small raw RGBA frame instead of a full-size JPEG: no encode here, no decode server-side
+            const canvas = webcamRef.current.getCanvas({ width: 160, height: 120 });
+            if(canvas) {
+                const frame = canvas.getContext('2d').getImageData(0, 0, 160, 120).data;
+                const ai = await axios.post(`http://localhost:8000/api/predict?lane=${lane}`, frame.buffer, { headers: {
+                    Authorization: `Bearer ${token}`, 'Content-Type': 'application/octet-stream', 'X-Frame-Shape': '120,160,4' } });
                 setDetected(ai.data.result);
             }
         }
@@ -35,15 +56,27 @@ export default function POS({ token, user }) {
     const price = data.prices[detected] || 0;
     if (data.weight <= 0) return;
     setCart([...cart, { name: detected, weight: data.weight, price, qty, total: data.weight * price * qty }]);
+    checkoutKey.current = null; // A different cart is a different sale
     setQty(1);
   };
 
   const checkout = async () => {
-    try {
-        const total = cart.reduce((a,b)=>a+b.total,0);
-        await axios.post('http://localhost:8000/api/checkout', { items: cart, total, cashier: user }, { headers: { Authorization: `Bearer ${token}` } });
-        alert("Saved!"); setCart([]);
-    } catch { alert("Failed"); }
+    // One key per cart: retries after a timeout are deduplicated server-side, so they can be quick and repeated
+    if (!checkoutKey.current) checkoutKey.current = crypto.randomUUID();
+    const total = cart.reduce((a,b)=>a+b.total,0);
+    const headers = { Authorization: `Bearer ${token}`, 'Idempotency-Key': checkoutKey.current };
+    for (let attempt = 0; attempt < 4; attempt++) {
+      try {
+        const res = await axios.post('http://localhost:8000/api/checkout', { items: cart, total, cashier: user }, { headers, timeout: 2000 });
+        checkoutKey.current = null;
+        // The server prices the cart (promotions, current prices); show its total when it differs from ours
+        alert(res.data.repaired && res.data.repaired.length ? `Saved! Total ${res.data.total.toFixed(2)} ฿` : "Saved!"); setCart([]);
+        return;
+      } catch (e) {
+        if (e.response && e.response.status < 500) break; // Rejected, not lost: retrying won't help
+      }
+    }
+    alert("Failed");
   };
 
   return (